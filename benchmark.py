@@ -0,0 +1,138 @@
+"""
+Benchmark the update pipeline with and without the "fast" runtime profile.
+
+Feeds synthetic getUpdates batches through the real dispatcher, middlewares
+and handlers. Bot API calls are answered in-process, after the request is
+encoded and the canned response decoded by the session's JSON codec, so
+only the network is left out.
+
+Usage:
+    python benchmark.py [--updates 20000] [--users 500]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BATCH_SIZE = 100
+
+# Each line is run in a child process with only RUNTIME_PROFILE changed
+PROFILES = [("default", ""), ("fast", "fast")]
+
+MESSAGE_RESULT = json.dumps({
+    "ok": True,
+    "result": {
+        "message_id": 1, "date": 0, "text": "ok",
+        "chat": {"id": 1, "type": "private"},
+        "from": {"id": 1, "is_bot": True, "first_name": "Bot"},
+    },
+})
+TRUE_RESULT = json.dumps({"ok": True, "result": True})
+
+
+def build_updates(count: int, users: int) -> list:
+    """A mix of commands, menu buttons and callbacks spread over `users` users."""
+    updates = []
+    for update_id in range(1, count + 1):
+        user_id = 100000 + update_id % users
+        sender = {"id": user_id, "is_bot": False, "first_name": "Bench", "language_code": "en"}
+        chat = {"id": user_id, "type": "private"}
+        kind = update_id % 5
+        if kind == 4:
+            updates.append({"update_id": update_id, "callback_query": {
+                "id": str(update_id), "from": sender, "chat_instance": "1", "data": "lang_en",
+                "message": {"message_id": 1, "date": 0, "chat": chat, "text": "menu"},
+            }})
+            continue
+        text = ["/help", "/status", "/support", "🌐 Change Language"][kind]
+        updates.append({"update_id": update_id, "message": {
+            "message_id": update_id, "date": 0, "chat": chat, "from": sender, "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else [],
+        }})
+    return updates
+
+
+def run_child(count: int, users: int) -> dict:
+    import asyncio
+    import logging
+
+    # No throttling, no log output: only the pipeline itself is measured
+    os.environ.update({
+        "THROTTLE_CHEAP_RATE": "1e9", "THROTTLE_CHEAP_BURST": "1e9",
+        "THROTTLE_EXPENSIVE_RATE": "1e9", "THROTTLE_EXPENSIVE_BURST": "1e9",
+        "THROTTLE_ABUSE_PER_MINUTE": str(10 ** 9), "LOG_LEVEL": "WARNING",
+    })
+    import bot as app
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.methods import GetUpdates
+    from utils.runtime import JSON_BACKEND, install_event_loop, json_dumps, json_loads
+
+    logging.disable(logging.WARNING)
+
+    class BenchSession(AiohttpSession):
+        async def make_request(self, bot, method, timeout=None):
+            self.build_form_data(bot=bot, method=method)
+            content = MESSAGE_RESULT if method.__returning__.__name__ == "Message" else TRUE_RESULT
+            return self.check_response(bot=bot, method=method, status_code=200, content=content).result
+
+    raw_updates = build_updates(count, users)
+    batches = [
+        json.dumps({"ok": True, "result": raw_updates[i:i + BATCH_SIZE]}, ensure_ascii=False)
+        for i in range(0, len(raw_updates), BATCH_SIZE)
+    ]
+
+    async def run() -> dict:
+        bot, dp, _ = app.create_dispatcher()
+        await bot.session.close()
+        bot.session = BenchSession(json_loads=json_loads, json_dumps=json_dumps)
+        get_updates = GetUpdates()
+
+        async def feed(batch: str) -> None:
+            updates = bot.session.check_response(bot=bot, method=get_updates, status_code=200, content=batch).result
+            await asyncio.gather(*(dp.feed_update(bot, update) for update in updates))
+
+        await feed(batches[0])  # Warm-up: imports, caches, first allocations
+        wall, cpu = time.perf_counter(), time.process_time()
+        for batch in batches:
+            await feed(batch)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        return {
+            "updates": count,
+            "updates_per_sec": round(count / wall),
+            "cpu_us_per_update": round(cpu / count * 1e6, 1),
+        }
+
+    loop_name = install_event_loop()
+    result = asyncio.run(run())
+    result.update(loop=loop_name, json=JSON_BACKEND)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.updates, args.users)))
+        return
+
+    print(f"{'profile':<10}{'loop':<10}{'json':<8}{'updates/s':>12}{'CPU µs/update':>16}")
+    for name, profile in PROFILES:
+        env = dict(os.environ, RUNTIME_PROFILE=profile)
+        env.setdefault("BOT_TOKEN", "123456:benchmark")
+        env.setdefault("ADMIN_ID", "1")
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", "--updates", str(args.updates), "--users", str(args.users)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:<10}{result['loop']:<10}{result['json']:<8}{result['updates_per_sec']:>12}{result['cpu_us_per_update']:>16}")
+
+
+if __name__ == "__main__":
+    main()
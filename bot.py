@@ -1,69 +1,304 @@
+# Imported first so the startup timings cover every import below
+from utils.startup import startup
+
 import asyncio
+import hmac
 import logging
 import os
+import time
+from datetime import timedelta
 from aiohttp import web
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import ErrorEvent
-
-from config import BOT_TOKEN
-# IMPORT ROUTERS - ORDER MATTERS
-from handlers.language import language_router 
-from handlers.start import start_router
-from handlers.premium import premium_router
-from handlers.admin import admin_router
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+from config import (
+    LOG_LEVEL, LOG_FORMAT, LOG_INFO_SAMPLE_RATE, SHUTDOWN_DRAIN_SECONDS, TIMERS_FILE,
+    THROTTLE_CHEAP_RATE, THROTTLE_CHEAP_BURST, THROTTLE_EXPENSIVE_RATE, THROTTLE_EXPENSIVE_BURST,
+    THROTTLE_ABUSE_PER_MINUTE, MAX_CONCURRENT_UPDATES, RENEWAL_REMIND_DAYS, RENEWAL_SWEEP_SECONDS,
+    DIAGNOSTICS_ENABLED, DIAGNOSTICS_TOKEN, REVIEW_TOKEN, OUTBOX_REPLAY_RATE, TENANTS_FILE
 )
+from utils.logging_setup import setup_logging
+from utils.journal import journal
+from utils.orders import orders
+from utils.diagnostics import diagnostics
+from utils.leader import leader
+from utils.review import create_review_app, review_context, thumbnails
+from utils.runtime import JSON_BACKEND, create_session, install_event_loop
+
+log_listener = setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_INFO_SAMPLE_RATE)
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
+# Runtime metrics served on /metrics, filled in once the dispatcher is built
+metrics_sources = {}
 
-@dp.error()
-async def error_handler(event: ErrorEvent):
-    logger.error(f"Unhandled error: {event.exception}", exc_info=True)
+
+async def error_handler(event):
+    logger.error("Unhandled error: %s", event.exception, exc_info=event.exception)
 
 async def health_check(request):
-    """Health check endpoint for Render."""
-    return web.Response(text="Bot is running! ✅")
+    """Health check endpoint for Render, with this instance's role."""
+    role = "leader" if leader.is_leader else "follower"
+    return web.Response(text=f"Bot is running! ✅\nRole: {role} ({leader.instance_id})")
+
+async def startup_report(request):
+    """Startup phase timings of this instance."""
+    return web.json_response(startup.report())
+
+async def metrics_report(request):
+    """Runtime metrics of the update pipeline."""
+    return web.json_response({name: source() for name, source in metrics_sources.items()})
+
+async def memory_report(request):
+    """Memory diagnostics, for whoever holds DIAGNOSTICS_TOKEN."""
+    token = request.headers.get("X-Diagnostics-Token") or request.query.get("token", "")
+    if not hmac.compare_digest(token, DIAGNOSTICS_TOKEN):
+        raise web.HTTPForbidden()
+    return web.json_response(await diagnostics.report())
 
 async def start_web_server():
     """Start web server for Render health checks."""
     app = web.Application()
     app.router.add_get('/', health_check)
     app.router.add_get('/health', health_check)
-    
+    app.router.add_get('/startup', startup_report)
+    app.router.add_get('/metrics', metrics_report)
+    # Only exposed when diagnostics are on and protected by a token
+    if DIAGNOSTICS_ENABLED and DIAGNOSTICS_TOKEN:
+        app.router.add_get('/debug/memory', memory_report)
+    # Payment review queue for admins, behind its own login
+    if REVIEW_TOKEN:
+        app.add_subapp('/review', create_review_app())
+
     port = int(os.getenv('PORT', 10000))
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', port)
     await site.start()
-    logger.info(f"Web server started on port {port}")
+    logger.info("Web server started on port %d", port)
+    return runner
+
+def create_dispatcher():
+    """
+    Import aiogram and the handlers, and build the bots and dispatcher.
+
+    Every tenant bot is served by the one dispatcher; the main bot is
+    returned, all of them are in `tenants.bots`.
+
+    Kept out of module scope: importing aiogram takes seconds on a cold
+    instance, and the health server should be listening before that.
+    """
+    from aiogram import Dispatcher
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from utils.middlewares import DeduplicationMiddleware, InFlightMiddleware, UpdateLoggingMiddleware
+    from utils.throttling import ThrottlingMiddleware, CHEAP, EXPENSIVE
+    from utils.executor import UserSerialExecutor
+    from utils.outbox import CircuitBreakerMiddleware, breaker, outbox
+    from utils.admission import admission
+    from utils.tenants import TenantMiddleware, tenants
+    # IMPORT ROUTERS - ORDER MATTERS
+    from handlers.language import language_router
+    from handlers.start import start_router
+    from handlers.premium import premium_router
+    from handlers.admin import admin_router
+
+    tenants.load(TENANTS_FILE)
+    for plans in tenants.catalogs():
+        plans.load()
+
+    # All bots share one session: one connection pool and one circuit breaker
+    session = create_session()
+    # Fail fast while the Bot API is down instead of every handler waiting for timeouts
+    session.middleware(CircuitBreakerMiddleware(breaker))
+    bot = tenants.create_bots(session)[0]
+    # State is stored per bot, user and chat, so bots never see each other's FSM data
+    storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)
+    dp.errors.register(error_handler)
 
-async def main():
     # REGISTER ROUTERS - Language must be first!
-    dp.include_router(language_router) 
+    dp.include_router(language_router)
     dp.include_router(start_router)
     dp.include_router(premium_router)
     dp.include_router(admin_router)
+
+    # Inner middlewares propagate to every included router
+    update_logging = UpdateLoggingMiddleware()
+    dp.message.middleware(update_logging)
+    dp.callback_query.middleware(update_logging)
+
+    # Tell handlers which bot an update came through, before anything else runs
+    dp.update.outer_middleware(TenantMiddleware(tenants))
+
+    # Outer middleware sees every update, so shutdown can drain them
+    in_flight = InFlightMiddleware()
+    dp.update.outer_middleware(in_flight)
+    deduplication = DeduplicationMiddleware()
+    dp.update.outer_middleware(deduplication)
+
+    # Throttle before the executor, so flooding users never hold a slot or a user lock
+    throttling = ThrottlingMiddleware(
+        limits={
+            CHEAP: (THROTTLE_CHEAP_RATE, THROTTLE_CHEAP_BURST),
+            EXPENSIVE: (THROTTLE_EXPENSIVE_RATE, THROTTLE_EXPENSIVE_BURST),
+        },
+        abuse_limit=THROTTLE_ABUSE_PER_MINUTE,
+        exempt=tenants.admin_ids()
+    )
+    dp.update.outer_middleware(throttling)
+
+    # Each user's updates run in order; different users run in parallel
+    executor = UserSerialExecutor(MAX_CONCURRENT_UPDATES)
+    dp.update.outer_middleware(executor)
+
+    if diagnostics.enabled:
+        from handlers.premium import _build_plan_keyboard, _build_plan_text, get_payment_actions_keyboard
+        from handlers.start import get_main_menu_keyboard
+        from utils.subscriptions import subscriptions
+        from utils.timer import running_timers
+        diagnostics.storage = storage
+        diagnostics.add_source("orders", lambda: len(orders))
+        diagnostics.add_source("subscriptions", lambda: len(subscriptions))
+        diagnostics.add_source("payment_timers", running_timers)
+        for cached in (_build_plan_keyboard, _build_plan_text, get_payment_actions_keyboard, get_main_menu_keyboard):
+            diagnostics.add_source(f"cache.{cached.__name__}", lambda cached=cached: cached.cache_info().currsize)
+
+    review_context.update(get_bot=tenants.bot, storage=storage)
+
+    metrics_sources.update({
+        "executor": executor.stats,
+        "throttling": lambda: {"throttled": throttling.throttled, "shed": throttling.shed},
+        "duplicates_dropped": lambda: deduplication.dropped,
+        "circuit_breaker": breaker.stats,
+        "outbox": outbox.stats,
+        "leader": leader.stats,
+        "admission": admission.stats,
+        "bots": lambda: tenants.stats(storage),
+        "logging_overhead_us": lambda: round(update_logging.overhead_us, 1),
+    })
+
+    return bot, dp, in_flight
+
+async def prewarm_caches():
+    """Warm up lazily loaded modules and cached keyboards in the background."""
+    from handlers.premium import get_plan_selection_keyboard, get_payment_actions_keyboard
+    from handlers.start import get_main_menu_keyboard
+    from handlers.premium import get_plan_selection_text
+    from utils.plans import catalog
+    from utils.qr_generator import generate_payment_qr
+    from utils.tenants import tenants
+    from utils.translations import TRANSLATIONS, get_language_keyboard
+
+    try:
+        with startup.phase("prewarm_keyboards"):
+            get_language_keyboard()
+            for lang in TRANSLATIONS:
+                for plans in tenants.catalogs():
+                    get_plan_selection_keyboard(lang, plans)
+                    get_plan_selection_text(lang, plans)
+                get_payment_actions_keyboard(lang)
+                get_main_menu_keyboard(lang)
+        # Loads qrcode and Pillow off the event loop before the first real order,
+        # using a catalog plan so the payload has a realistic size
+        with startup.phase("prewarm_qr"):
+            for plan in catalog.plans:
+                if plan.available:
+                    await asyncio.to_thread(generate_payment_qr, plan.title, plan.price, "FB000000")
+                    break
+        logger.info("Caches prewarmed")
+    except Exception as e:
+        logger.warning("Cache prewarm failed: %s", e)
+
+async def shutdown(bot, storage, runner, in_flight, background_tasks):
+    """
+    Finish the work of a stopped bot without dropping payments.
     
-    logger.info("Bot started successfully! 🚀")
-    
-    # Start Render Web Server
-    await start_web_server()
-    
+    Runs after polling has stopped: waits for in-flight updates and
+    admin jobs up to SHUTDOWN_DRAIN_SECONDS, saves running payment timers
+    and unfinished checkouts with their users' state, flushes the
+    journal, then closes the bot session and the web server.
+    """
+    from handlers.admin import drain_admin_jobs
+    from utils.timer import instance_timers_path, persist_timers
+
+    started = time.perf_counter()
+    (finished, abandoned), (jobs_finished, jobs_abandoned) = await asyncio.gather(
+        in_flight.drain(SHUTDOWN_DRAIN_SECONDS), drain_admin_jobs(SHUTDOWN_DRAIN_SECONDS)
+    )
+    # Resign first: that ends the campaign and the timer restore job, so they
+    # cannot take the lease back and re-claim the timers saved below
+    await leader.resign()
+    saved_timers = await persist_timers(instance_timers_path(TIMERS_FILE, leader.instance_id), storage)
+
+    for task in background_tasks:
+        task.cancel()
+    thumbnails.close()
+    await journal.close()
+    # Shared by every tenant bot
+    await bot.session.close()
+    await runner.cleanup()
+
+    logger.info(
+        "Shutdown complete in %.1f s: %d updates drained, %d abandoned, %d admin jobs finished, %d abandoned, "
+        "%d checkouts saved, journal flushed at seq %d",
+        time.perf_counter() - started, finished, abandoned, jobs_finished, jobs_abandoned, saved_timers,
+        journal.projection.seq
+    )
+
+async def main():
+    # Start Render Web Server first so the instance is reachable right away
+    with startup.phase("web_server"):
+        runner = await start_web_server()
+
+    # Imported in a worker thread so health checks are answered meanwhile
+    with startup.phase("import_app"):
+        bot, dp, in_flight = await asyncio.to_thread(create_dispatcher)
+
+    # Restore orders and subscriptions from the payment journal
+    with startup.phase("restore_state"):
+        from utils.timer import run_timer_restore
+        from utils.subscriptions import subscriptions, run_renewal_sweeper
+        from utils.outbox import outbox, run_outbox_replay
+        from utils.admission import run_admission_release
+        from utils.tenants import tenants
+        await journal.start(default_bot_id=tenants.primary.bot_id)
+        orders.restore(journal.projection.pending_orders())
+        subscriptions.restore(list(journal.projection.subscriptions.values()))
+        spooled = await asyncio.to_thread(outbox.load)
+        if spooled:
+            logger.info("%d undelivered messages waiting in the outbox", spooled)
+        await leader.elect()
+
+    # Singleton jobs run on the leader only and move with the leadership;
+    # they reach each user through the bot stored with the user's record
+    leader.add_job("renewal_sweeper", lambda: run_renewal_sweeper(
+        tenants.bot, RENEWAL_SWEEP_SECONDS, timedelta(days=RENEWAL_REMIND_DAYS)
+    ))
+    leader.add_job("outbox_replay", lambda: run_outbox_replay(tenants.bot, OUTBOX_REPLAY_RATE))
+    # Timers saved by any instance on shutdown are restored by whoever leads, whenever that starts
+    leader.add_job("timer_restore", lambda: run_timer_restore(tenants.bot, dp.storage, TIMERS_FILE))
+
+    background_tasks = [
+        asyncio.create_task(prewarm_caches()),
+        asyncio.create_task(leader.campaign()),
+        # The waitlist lives in this instance's memory, so every instance releases its own
+        asyncio.create_task(run_admission_release(tenants.bot)),
+    ]
+
+    # Allocation tracing starts after startup so imports are not in the baseline
+    diagnostics.start()
+    startup.mark_ready()
+    logger.info("Bot started successfully with %d bots! 🚀", len(tenants.bots))
+
     try:
-        await dp.start_polling(bot, skip_updates=True)
+        # Polling stops on SIGTERM/SIGINT; the session stays open for the drain
+        await dp.start_polling(*tenants.bots.values(), skip_updates=True, close_bot_session=False)
     finally:
-        await bot.session.close()
+        await shutdown(bot, dp.storage, runner, in_flight, background_tasks)
 
 if __name__ == "__main__":
+    loop_name = install_event_loop()
+    logger.info("Runtime: %s event loop, %s JSON", loop_name, JSON_BACKEND)
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
-        
+    finally:
+        log_listener.stop()
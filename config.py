@@ -17,3 +17,67 @@ try:
     ADMIN_ID = int(ADMIN_ID)
 except ValueError:
     raise ValueError("ADMIN_ID must be a valid integer")
+
+# Credits up to this many minutes after an order was submitted can still match it
+RECONCILE_WINDOW_MINUTES = int(os.getenv("RECONCILE_WINDOW_MINUTES", 30))
+# Credits that already approved an order, so re-imported statements cannot approve another
+RECONCILE_LEDGER_FILE = os.getenv("RECONCILE_LEDGER_FILE", "data/reconciled_credits.txt")
+
+# Logging: "json" or "text" output, and the share of INFO records to keep
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", 1.0))
+
+# Directory for the append-only payment event journal and its snapshots
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "data/journal")
+
+# Shutdown: how long to wait for in-flight updates, and where running payment timers are saved
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", 20))
+TIMERS_FILE = os.getenv("TIMERS_FILE", "data/timers.json")
+
+# Throttling: (tokens per second, burst) per action class, and the per-minute abuse cutoff
+THROTTLE_CHEAP_RATE = float(os.getenv("THROTTLE_CHEAP_RATE", 1.0))
+THROTTLE_CHEAP_BURST = float(os.getenv("THROTTLE_CHEAP_BURST", 5))
+THROTTLE_EXPENSIVE_RATE = float(os.getenv("THROTTLE_EXPENSIVE_RATE", 0.1))
+THROTTLE_EXPENSIVE_BURST = float(os.getenv("THROTTLE_EXPENSIVE_BURST", 2))
+THROTTLE_ABUSE_PER_MINUTE = int(os.getenv("THROTTLE_ABUSE_PER_MINUTE", 60))
+
+# Maximum number of updates handled at the same time (each user's updates still run in order)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", 100))
+
+# Plan catalog (JSON); edits are picked up without a restart
+PLANS_FILE = os.getenv("PLANS_FILE", "plans.json")
+
+# Renewal reminders: how many days before expiry, and how often to check (seconds)
+RENEWAL_REMIND_DAYS = int(os.getenv("RENEWAL_REMIND_DAYS", 3))
+RENEWAL_SWEEP_SECONDS = float(os.getenv("RENEWAL_SWEEP_SECONDS", 600))
+
+# Memory diagnostics (/memory and /debug/memory); off by default as allocation tracing has a cost
+DIAGNOSTICS_ENABLED = os.getenv("DIAGNOSTICS_ENABLED", "").lower() in ("1", "true", "yes")
+DIAGNOSTICS_TOKEN = os.getenv("DIAGNOSTICS_TOKEN", "")
+
+# Web review queue at /review; disabled unless a token is set
+REVIEW_TOKEN = os.getenv("REVIEW_TOKEN", "")
+REVIEW_PAGE_SIZE = int(os.getenv("REVIEW_PAGE_SIZE", 24))
+THUMBNAILS_DIR = os.getenv("THUMBNAILS_DIR", "data/thumbnails")
+
+# Circuit breaker for Bot API calls and the outbox for messages that could not be sent
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", 30))
+OUTBOX_FILE = os.getenv("OUTBOX_FILE", "data/outbox.jsonl")
+OUTBOX_REPLAY_RATE = float(os.getenv("OUTBOX_REPLAY_RATE", 20))
+
+# Leader election between instances sharing the data directory; the leader runs singleton jobs
+LEADER_DB = os.getenv("LEADER_DB", "data/leader.sqlite3")
+LEADER_LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", 15))
+INSTANCE_ID = os.getenv("INSTANCE_ID", "")
+
+# Admission control: above this many pending orders plus running checkouts, new buyers join a waitlist (0 disables)
+ADMISSION_MAX_BACKLOG = int(os.getenv("ADMISSION_MAX_BACKLOG", 50))
+ADMISSION_INVITE_MINUTES = float(os.getenv("ADMISSION_INVITE_MINUTES", 10))
+
+# "edit" runs the checkout in one message that is edited in place instead of posting new ones
+FLOW_MODE = os.getenv("FLOW_MODE", "").lower()
+
+# More storefront bots served by this process (JSON); the bot configured above is always served
+TENANTS_FILE = os.getenv("TENANTS_FILE", "")
@@ -1,25 +1,81 @@
 import logging
 import asyncio
-from datetime import datetime
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Coroutine, Optional, Set, Tuple
 
 from aiogram import Router, F, Bot
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import BufferedInputFile, CallbackQuery, FSInputFile, Message
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
 from aiogram.filters import Command
 from aiogram.enums import ChatAction, ContentType
+from aiogram.methods import SendMessage
 
-from config import ADMIN_ID
+from config import RECONCILE_LEDGER_FILE, RECONCILE_WINDOW_MINUTES
 from utils.translations import get_text
+from utils.orders import Order, orders
+from utils.journal import journal
+from utils.reconciliation import CreditLedger, StatementMatcher, reconcile_statement
+from utils.export import export, FORMATS
+from utils.diagnostics import diagnostics, format_report
+from utils.profiler import profiler, format_profile, MAX_DURATION
+from utils.subscriptions import subscriptions
+from utils.outbox import deliver
+from utils.admission import admission
+from utils.tenants import Tenant, tenants
 from handlers.language import get_user_language
+from handlers.premium import get_admin_approval_keyboard
 
 logger = logging.getLogger(__name__)
 admin_router = Router()
 
+# Credits already used for an approval, shared by every statement import
+credit_ledger = CreditLedger(RECONCILE_LEDGER_FILE)
+# One statement at a time, so two imports never race for the same credits
+_reconcile_lock = asyncio.Lock()
+# Long admin jobs still running; referenced here so they are not garbage collected
+_admin_jobs: Set[asyncio.Task] = set()
+
+
+def start_admin_job(job: Coroutine, name: str) -> asyncio.Task:
+    """
+    Run a long admin command in the background.
+    
+    The handler returns right away, so the admin's user lock and executor
+    slot are free while the job runs; the job sends its own report.
+    """
+    task = asyncio.create_task(job, name=name)
+    _admin_jobs.add(task)
+    
+    def _done(done: asyncio.Task):
+        _admin_jobs.discard(done)
+        if not done.cancelled() and done.exception() is not None:
+            logger.error("Admin job %s failed", name, exc_info=done.exception())
+    
+    task.add_done_callback(_done)
+    return task
+
+
+async def drain_admin_jobs(timeout: float) -> Tuple[int, int]:
+    """
+    Wait for running admin jobs on shutdown, so a reconciliation is not cut
+    off between using a credit and recording the approval.
+    
+    Returns:
+        Tuple of (jobs finished, jobs still running)
+    """
+    pending = set(_admin_jobs)
+    if not pending:
+        return 0, 0
+    done, not_done = await asyncio.wait(pending, timeout=timeout)
+    return len(done), len(not_done)
+
 @admin_router.message(Command("admin"))
-async def admin_dashboard(message: Message):
+async def admin_dashboard(message: Message, tenant: Tenant):
     """Show admin dashboard (admin only)."""
-    if message.from_user.id != ADMIN_ID:
+    if not tenant.is_admin(message.from_user.id):
         return
     
     await message.answer(
@@ -28,22 +84,50 @@ async def admin_dashboard(message: Message):
         "📊 /stats - View statistics\n"
         "👥 /users - User management\n"
         "💳 /pending - View pending payments\n"
+        "📄 /reconcile - Match a bank statement to orders\n"
+        "🔖 /order - Find an order by payment reference\n"
+        "🗂 /reload_plans - Reload the plan catalog\n"
+        "📤 /export - Export orders or users for accounting\n"
+        "🧠 /memory - Memory diagnostics\n"
+        "⏱ /profile - Profile the bot for a few seconds\n"
         "📢 /broadcast - Send message to all users\n\n"
         "💡 <i>Manage your bot efficiently!</i>",
         parse_mode="HTML"
     )
 
+def parse_order_callback(data: str, bot_id: int) -> Tuple[str, int, int]:
+    """
+    Split order button data of the form "<action>_<bot_id>_<user_id>".
+    
+    Buttons sent before the bot ID was included carry only the user ID
+    and belong to the bot they were pressed in.
+    
+    Args:
+        data: Callback data of an admin approval keyboard button
+        bot_id: ID of the bot that received the callback
+    
+    Returns:
+        tuple: (action, bot ID, user ID)
+    
+    Raises:
+        ValueError: If the data is malformed
+    """
+    action, *ids = data.split("_")
+    if len(ids) == 1:
+        return action, bot_id, int(ids[0])
+    order_bot_id, user_id = ids
+    return action, int(order_bot_id), int(user_id)
+
+
 @admin_router.callback_query(F.data.startswith("contact_"))
-async def contact_user(callback: CallbackQuery, bot: Bot):
+async def contact_user(callback: CallbackQuery, bot: Bot, tenant: Tenant):
     """Allow admin to contact user directly."""
-    if callback.from_user.id != ADMIN_ID:
+    if not tenant.is_admin(callback.from_user.id):
         await callback.answer("⛔ Unauthorized!", show_alert=True)
         return
     
-    user_id_str = callback.data.split("_", 1)[1]
-    
     try:
-        user_id = int(user_id_str)
+        _, _, user_id = parse_order_callback(callback.data, bot.id)
         await callback.answer("📞 Opening chat...")
         
         await callback.message.answer(
@@ -54,86 +138,432 @@ async def contact_user(callback: CallbackQuery, bot: Bot):
         )
     except Exception as e:
         await callback.answer("❌ Error", show_alert=True)
-        logger.error(f"Error in contact_user: {e}")
+        logger.error("Error in contact_user: %s", e)
 
-@admin_router.callback_query(F.data.startswith("approve_") | F.data.startswith("reject_"))
-async def handle_admin_decision(callback: CallbackQuery, bot: Bot, state: FSMContext):
-    """Handle admin approval or rejection with SAFE message editing."""
-    
-    # 1. Security Check
-    if callback.from_user.id != ADMIN_ID:
-        await callback.answer("⛔ Unauthorized access!", show_alert=True)
+@admin_router.message(Command("reload_plans"))
+async def reload_plans(message: Message, tenant: Tenant):
+    """Reload this bot's plan catalog file right away (admin only)."""
+    if not tenant.is_admin(message.from_user.id):
         return
     
-    # 2. Parse Data
+    catalog = tenant.catalog
     try:
-        action, user_id_str = callback.data.split("_", 1)
-        user_id = int(user_id_str)
-    except ValueError:
-        await callback.answer("❌ Invalid data", show_alert=True)
+        count = catalog.load()
+    except (OSError, ValueError) as e:
+        await message.answer(f"❌ Could not load plans, keeping the current ones: {e}")
+        return
+    
+    lines = [f"✅ <b>{count} plans loaded</b> (version {catalog.version})\n"]
+    for plan in catalog.plans:
+        status = "🟢" if plan.available else "🔜"
+        lines.append(f"{status} <code>{plan.id}</code> - {plan.title} - ₹{plan.price} / {plan.duration_days} days")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@admin_router.message(Command("order"))
+async def lookup_order(message: Message, tenant: Tenant):
+    """Look up an open order by its payment reference (admin only)."""
+    if not tenant.is_admin(message.from_user.id):
         return
     
-    # 3. Get User Language (Safe Method)
+    parts = message.text.split(maxsplit=1)
+    if len(parts) < 2:
+        await message.answer("Usage: <code>/order FBXXXXXX</code>", parse_mode="HTML")
+        return
+    
+    order = orders.find(parts[1])
+    if order is None or tenants.get(order.bot_id) is not tenant:
+        await message.answer("❌ No open order with this reference.")
+        return
+    
+    await message.answer(
+        f"🔖 <b>ORDER {order.reference}</b>\n\n"
+        f"🆔 User: <code>{order.user_id}</code>\n"
+        f"📦 Plan: <b>{order.plan_name}</b>\n"
+        f"💰 Amount: <b>₹{order.amount}</b>\n"
+        f"📧 Email: <b>{order.email}</b>\n"
+        f"📅 Submitted: {order.submitted_at.strftime('%d %b %Y, %I:%M %p')}\n"
+        f"📌 Status: <b>{order.status}</b>",
+        parse_mode="HTML",
+        reply_markup=get_admin_approval_keyboard(order.bot_id, order.user_id)
+    )
+
+
+DECISION_STATUS = {"approve": "approved", "reject": "rejected"}
+
+
+def claim_decision(bot_id: int, user_id: int, action: str) -> Optional[Order]:
+    """
+    Move a pending order to its decided status, exactly once.
+    
+    Duplicate taps and redelivered callbacks find the order already
+    decided and get None, before any Telegram API call is made.
+    """
+    return orders.transition(bot_id, user_id, "pending", DECISION_STATUS[action])
+
+
+async def apply_decision(
+    bot: Bot,
+    storage: BaseStorage,
+    order: Order,
+    admin_message: Optional[Message] = None,
+    decided_by: str = "Admin"
+):
+    """
+    Carry out a decision claimed with `claim_decision`.
+    
+    Notifies the user, marks the admin notification as decided and resets
+    the user's payment flow. Used by both the admin buttons and automated
+    payment reconciliation.
+    
+    Args:
+        bot: Bot instance for sending messages
+        storage: FSM storage holding the user's state
+        order: Order already moved to "approved" or "rejected"
+        admin_message: Admin notification to edit (looked up from the order if omitted)
+        decided_by: Who made the decision, shown on the admin notification
+    """
+    user_id = order.user_id
+    admin_chat_id = tenants.get(bot.id).admin_id
+    
+    # Get User Language (Safe Method)
+    user_storage_key = StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id)
+    user_state = FSMContext(storage=storage, key=user_storage_key)
     try:
-        user_storage_key = StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id)
-        user_state = FSMContext(bot=bot, storage=state.storage, key=user_storage_key)
         lang = await get_user_language(user_state)
     except Exception as e:
-        logger.error(f"Could not fetch user language: {e}")
+        logger.error("Could not fetch user language: %s", e)
         lang = "en"  # Fallback to English if state fetch fails
     
-    await bot.send_chat_action(callback.message.chat.id, ChatAction.TYPING)
+    current_time = datetime.now().strftime('%H:%M:%S')
     
-    try:
-        current_time = datetime.now().strftime('%H:%M:%S')
-        
-        # Prepare status text based on action
-        if action == "approve":
-            status_text = f"✅ <b>APPROVED</b>\nBy: Admin\nTime: {current_time}"
-            user_msg_key = "approved"
-            log_msg = f"✅ Approved User {user_id}"
-        else:
-            status_text = f"❌ <b>REJECTED</b>\nBy: Admin\nTime: {current_time}"
-            user_msg_key = "rejected"
-            log_msg = f"❌ Rejected User {user_id}"
+    # Prepare status text based on the decision
+    if order.status == "approved":
+        status_text = f"✅ <b>APPROVED</b>\nBy: {decided_by}\nTime: {current_time}"
+        user_msg_key = "approved"
+        log_msg = f"✅ Approved User {user_id}"
+    else:
+        status_text = f"❌ <b>REJECTED</b>\nBy: {decided_by}\nTime: {current_time}"
+        user_msg_key = "rejected"
+        log_msg = f"❌ Rejected User {user_id}"
 
-        # 4. Notify the User (Try/Except in case user blocked bot)
-        try:
-            await bot.send_message(
-                chat_id=user_id,
-                text=get_text(lang, user_msg_key),
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logger.warning(f"Could not message user {user_id}: {e}")
-            # We continue execution even if we can't message the user
+    # Notify the User (Try/Except in case user blocked bot); spooled if the API is down
+    try:
+        await deliver(bot, SendMessage(
+            chat_id=user_id,
+            text=get_text(lang, user_msg_key),
+            parse_mode="HTML"
+        ))
+    except Exception as e:
+        logger.warning("Could not message user %s: %s", user_id, e)
+        # We continue execution even if we can't message the user
 
-        # 5. FIX: Edit Admin Message (Handles both Text and Photo/Caption)
+    orders.remove(order.bot_id, user_id)
+    admission.record_decision()
+    if order.status == "approved":
+        subscription = subscriptions.activate(
+            user_id, order.plan_id, order.plan_name, order.duration_days, lang, bot_id=order.bot_id
+        )
+        journal.record(
+            order.status, user_id,
+            decided_by=decided_by, expires_at=subscription.expires_at.isoformat(), bot_id=order.bot_id
+        )
+    else:
+        journal.record(order.status, user_id, decided_by=decided_by, bot_id=order.bot_id)
+    
+    # Edit Admin Message (Handles both Text and Photo/Caption)
+    if admin_message is not None:
         # Check if the original message has a caption (is a Photo/Document)
-        if callback.message.caption:
-            await callback.message.edit_caption(
-                caption=f"{callback.message.caption}\n\n{status_text}",
+        if admin_message.caption:
+            await admin_message.edit_caption(
+                caption=f"{admin_message.caption}\n\n{status_text}",
                 parse_mode="HTML",
                 reply_markup=None
             )
         # Otherwise, assume it is a Text message
-        elif callback.message.text:
-            await callback.message.edit_text(
-                text=f"{callback.message.text}\n\n{status_text}",
+        elif admin_message.text:
+            await admin_message.edit_text(
+                text=f"{admin_message.text}\n\n{status_text}",
                 parse_mode="HTML",
                 reply_markup=None
             )
         else:
             # Fallback if message type is weird
-            await callback.message.edit_reply_markup(reply_markup=None)
-            await callback.message.answer(status_text, parse_mode="HTML")
+            await admin_message.edit_reply_markup(reply_markup=None)
+            await admin_message.answer(status_text, parse_mode="HTML")
+    elif order.admin_message_id:
+        try:
+            await bot.edit_message_caption(
+                chat_id=admin_chat_id,
+                message_id=order.admin_message_id,
+                caption=f"{order.admin_caption}\n\n{status_text}",
+                parse_mode="HTML",
+                reply_markup=None
+            )
+        except Exception as e:
+            logger.warning("Could not update admin notification for user %s: %s", user_id, e)
 
-        # 6. Finalize
-        await bot.send_message(ADMIN_ID, log_msg)
-        await user_state.clear()
-        await user_state.update_data(language=lang)
-        
+    # Finalize
+    await deliver(bot, SendMessage(chat_id=admin_chat_id, text=log_msg))
+    await user_state.clear()
+    await user_state.update_data(language=lang)
+
+
+@admin_router.callback_query(F.data.startswith("approve_") | F.data.startswith("reject_"))
+async def handle_admin_decision(callback: CallbackQuery, bot: Bot, state: FSMContext, tenant: Tenant):
+    """Handle admin approval or rejection with SAFE message editing."""
+    
+    # 1. Security Check
+    if not tenant.is_admin(callback.from_user.id):
+        await callback.answer("⛔ Unauthorized access!", show_alert=True)
+        return
+    
+    # 2. Parse Data
+    try:
+        action, bot_id, user_id = parse_order_callback(callback.data, bot.id)
+    except ValueError:
+        await callback.answer("❌ Invalid data", show_alert=True)
+        return
+    if tenants.get(bot_id) is not tenant:
+        await callback.answer("⛔ Unauthorized access!", show_alert=True)
+        return
+    
+    # 3. Claim the order - duplicate taps and redeliveries stop here
+    order = claim_decision(bot_id, user_id, action)
+    if order is None:
+        await callback.answer("ℹ️ Already processed")
+        return
+    
+    await bot.send_chat_action(callback.message.chat.id, ChatAction.TYPING)
+    
+    # 4. Notify user, update the admin message and reset the user's flow
+    try:
+        await apply_decision(bot, state.storage, order, admin_message=callback.message)
     except Exception as e:
-        logger.error(f"CRITICAL ERROR in admin decision: {e}", exc_info=True)
+        logger.error("CRITICAL ERROR in admin decision: %s", e, exc_info=True)
         await callback.answer(f"❌ Error: {str(e)[:50]}...", show_alert=True)
+
+
+@admin_router.message(Command("reconcile"))
+async def reconcile_payments(message: Message, bot: Bot, state: FSMContext, tenant: Tenant):
+    """Auto-approve this bot's pending orders that match credits in an uploaded statement (admin only)."""
+    if not tenant.is_admin(message.from_user.id):
+        return
+    
+    if not message.document:
+        await message.answer(
+            "📄 <b>Payment Reconciliation</b>\n\n"
+            "Send your UPI/bank statement export as a <b>CSV file</b> "
+            "with the caption <code>/reconcile</code>.\n\n"
+            "Confident matches are approved automatically, "
+            "ambiguous ones are left for manual review.",
+            parse_mode="HTML"
+        )
+        return
+    
+    if _reconcile_lock.locked():
+        await message.answer("⏳ A reconciliation is already running.")
+        return
+    
+    await message.answer("📄 Statement received, reconciling... The report follows when it is done.")
+    start_admin_job(_reconcile(message, bot, state.storage, tenant), "reconcile")
+
+
+async def _reconcile(message: Message, bot: Bot, storage: BaseStorage, tenant: Tenant):
+    """Match the statement attached to `message`, approve confident matches and report."""
+    async with _reconcile_lock:
+        pending = [order for order in orders.pending() if tenants.get(order.bot_id) is tenant]
+        window = timedelta(minutes=RECONCILE_WINDOW_MINUTES)
         
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "statement.csv")
+            try:
+                await bot.download(message.document, destination=path)
+                # Parse off the event loop - statements can be large
+                report = await asyncio.to_thread(reconcile_statement, path, pending, window, credit_ledger)
+            except ValueError as e:
+                await message.answer(f"❌ Could not read statement: {e}")
+                return
+            except Exception as e:
+                logger.error("Reconciliation failed: %s", e, exc_info=True)
+                await message.answer("❌ Reconciliation failed. Check the file and try again.")
+                return
+        
+        approved = 0
+        for credit, order in report.matched:
+            # Skip orders decided manually while the statement was processed
+            if (
+                orders.get(order.bot_id, order.user_id) is not order
+                or claim_decision(order.bot_id, order.user_id, "approve") is None
+            ):
+                continue
+            # Recorded before the approval goes out, so the credit can never approve twice
+            try:
+                await asyncio.to_thread(credit_ledger.add, credit.fingerprint)
+            except Exception as e:
+                # Without the record the credit could approve again, so leave the order pending
+                orders.transition(order.bot_id, order.user_id, "approved", "pending")
+                logger.error("Could not record credit for user %s, not approving: %s", order.user_id, e)
+                continue
+            try:
+                await apply_decision(bot, storage, order, decided_by="Reconciliation")
+                approved += 1
+            except Exception as e:
+                logger.error("Auto-approval failed for user %s: %s", order.user_id, e, exc_info=True)
+        
+        lines = [
+            "📄 <b>RECONCILIATION REPORT</b>\n",
+            f"💳 Credits read: <b>{report.credits}</b>",
+            f"✅ Auto-approved: <b>{approved}</b>",
+            f"⚠️ Ambiguous: <b>{len(report.ambiguous)}</b>",
+            f"🔖 Reference not pending: <b>{len(report.unresolved)}</b>",
+            f"♻️ Already used: <b>{report.already_used}</b>",
+            f"➖ Unmatched: <b>{report.unmatched}</b>",
+        ]
+        if report.ambiguous or report.unresolved:
+            lines.append("\n👇 <i>Review manually:</i>")
+            for credit, candidates in report.ambiguous[:20]:
+                users = ", ".join(f"<code>{o.user_id}</code>" for o in candidates)
+                lines.append(f"• Line {credit.line}: ₹{credit.amount} at {credit.time:%d %b %H:%M} → {users}")
+            for credit in report.unresolved[:20]:
+                references = ", ".join(StatementMatcher.quoted_references(credit))
+                lines.append(f"• Line {credit.line}: ₹{credit.amount} quotes {references}")
+        
+        await message.answer("\n".join(lines), parse_mode="HTML")
+        logger.info(
+            "Reconciliation: %d credits, %d approved, %d ambiguous",
+            report.credits, approved, len(report.ambiguous)
+        )
+
+
+@admin_router.message(Command("export"))
+async def export_records(message: Message, bot: Bot):
+    """Send an export of orders or users as a document (main bot's admins only)."""
+    # Covers every bot served by this process, so only the main bot's admins may export
+    if not tenants.primary.is_admin(message.from_user.id):
+        return
+    
+    # /export orders [csv|ndjson] [gz] [YYYY-MM] or /export users [csv|ndjson] [gz]
+    args = message.text.split()[1:]
+    kind = args[0] if args else ""
+    fmt = next((a for a in args if a in FORMATS), "csv")
+    compress = "gz" in args
+    month = next((a for a in args if len(a) == 7 and a[4] == "-"), None)
+    
+    if kind not in ("orders", "users"):
+        await message.answer(
+            "📤 <b>Export</b>\n\n"
+            "Usage: <code>/export orders [csv|ndjson] [gz] [YYYY-MM]</code>\n"
+            "or <code>/export users [csv|ndjson] [gz]</code>\n\n"
+            "Example: <code>/export orders csv gz 2026-09</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    if month and kind == "users":
+        await message.answer("❌ A month can only be given for orders; users are exported in full.")
+        return
+    
+    since = until = None
+    if month:
+        try:
+            start = datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            await message.answer("❌ Month must look like 2026-09")
+            return
+        # Timestamps are ISO strings, so a month is a plain string range
+        since = f"{start:%Y-%m}"
+        until = f"{start.year + start.month // 12}-{start.month % 12 + 1:02d}"
+    
+    filename = f"{kind}-{month or datetime.now().strftime('%Y-%m-%d')}.{fmt}"
+    if compress:
+        filename += ".gz"
+    
+    await message.answer(f"📤 Exporting {kind}... The file follows when it is ready.")
+    start_admin_job(_export(message, bot, kind, filename, fmt, compress, since, until, month), "export")
+
+
+async def _export(
+    message: Message,
+    bot: Bot,
+    kind: str,
+    filename: str,
+    fmt: str,
+    compress: bool,
+    since: Optional[str],
+    until: Optional[str],
+    month: Optional[str]
+):
+    """Write the export requested by `message` and send it as a document."""
+    await bot.send_chat_action(message.chat.id, ChatAction.UPLOAD_DOCUMENT)
+    # Make sure events of the last second are on disk before reading them back
+    await journal.flush()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, filename)
+        try:
+            count = await asyncio.to_thread(
+                export, journal, kind, path, fmt, compress, since, until, tenants.primary.bot_id
+            )
+            await message.answer_document(
+                FSInputFile(path, filename=filename),
+                caption=f"📤 {count} {kind}" + (f" created in {month}" if month else "")
+            )
+        except Exception as e:
+            logger.error("Export failed: %s", e, exc_info=True)
+            await message.answer("❌ Export failed. Check the logs.")
+
+
+@admin_router.message(Command("memory"))
+async def memory_diagnostics(message: Message):
+    """Show memory diagnostics; repeat to see what grew in between (main bot's admins only)."""
+    if not tenants.primary.is_admin(message.from_user.id):
+        return
+    
+    if not diagnostics.enabled:
+        await message.answer(
+            "🧠 Memory diagnostics are off. Set <code>DIAGNOSTICS_ENABLED=1</code> and restart.",
+            parse_mode="HTML"
+        )
+        return
+    
+    report = await diagnostics.report()
+    await message.answer(format_report(report), parse_mode="HTML")
+
+
+@admin_router.message(Command("profile"))
+async def profile_bot(message: Message):
+    """Sample the running bot for a few seconds and report where time goes (main bot's admins only)."""
+    if not tenants.primary.is_admin(message.from_user.id):
+        return
+    
+    parts = message.text.split()
+    try:
+        duration = min(max(int(parts[1]), 1), MAX_DURATION) if len(parts) > 1 else 10
+    except ValueError:
+        await message.answer(f"Usage: <code>/profile [seconds, up to {MAX_DURATION}]</code>", parse_mode="HTML")
+        return
+    
+    if profiler.running:
+        await message.answer("⏳ A profile is already running.")
+        return
+    
+    await message.answer(f"⏱ Profiling for {duration} s... The report follows when it is done.")
+    start_admin_job(_profile(message, duration), "profile")
+
+
+async def _profile(message: Message, duration: int):
+    """Sample for `duration` seconds and send the report."""
+    try:
+        report = await profiler.profile(duration)
+    except RuntimeError:
+        # Another admin started one between the check and this job
+        await message.answer("⏳ A profile is already running.")
+        return
+    
+    await message.answer(format_profile(report), parse_mode="HTML")
+    if report.stacks:
+        await message.answer_document(
+            BufferedInputFile(report.collapsed().encode(), filename="profile.collapsed.txt"),
+            caption="🔥 Collapsed stacks (flamegraph.pl / speedscope)"
+        )
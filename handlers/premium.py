@@ -2,6 +2,7 @@
 import asyncio
 import logging
 import re
+from functools import lru_cache
 from datetime import datetime, timedelta
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
@@ -11,31 +12,60 @@ from aiogram.enums import ChatAction
 
 from handlers import PremiumStates
 from utils.qr_generator import generate_payment_qr
-from utils.timer import start_payment_timer
+from utils.timer import schedule_payment_timer
 from utils.translations import get_text
+from utils.orders import Order, orders
+from utils.journal import journal
+from utils.plans import PlanCatalog, catalog
+from utils.admission import admission, format_wait
+from utils.flow import EDIT_FLOW, close_screen, show_plans, show_screen
+from utils.tenants import Tenant
 from handlers.language import get_user_language
-from config import ADMIN_ID
 
 logger = logging.getLogger(__name__)
 premium_router = Router()
 
 
-def get_plan_selection_keyboard(lang="en") -> InlineKeyboardMarkup:
-    """Create inline keyboard with plan options."""
-    # Note: Plan names could also be translated if desired
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="1 Month - ₹20", callback_data="plan_1month_20")],
-            [InlineKeyboardButton(text="3 Months - ₹55", callback_data="plan_3months_55")],
-            [InlineKeyboardButton(text=get_text(lang, "coming_soon") + " - ₹100", callback_data="coming_soon")],
-            [InlineKeyboardButton(text=get_text(lang, "back_menu"), callback_data="back_to_menu")]
-        ]
-    )
-    return keyboard
+@lru_cache(maxsize=64)
+def _build_plan_keyboard(plans: PlanCatalog, lang: str, version: int) -> InlineKeyboardMarkup:
+    rows = []
+    for plan in plans.plans:
+        if plan.available:
+            rows.append([InlineKeyboardButton(text=f"{plan.name(lang)} - ₹{plan.price}", callback_data=plan.callback_data)])
+        else:
+            rows.append([InlineKeyboardButton(text=f"{get_text(lang, 'coming_soon')} - ₹{plan.price}", callback_data="coming_soon")])
+    rows.append([InlineKeyboardButton(text=get_text(lang, "back_menu"), callback_data="back_to_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@lru_cache(maxsize=64)
+def _build_plan_text(plans: PlanCatalog, lang: str, version: int) -> str:
+    blocks = [get_text(lang, "choose_plan_header")]
+    for plan in plans.plans:
+        if plan.available:
+            title = f"🔹 <b>{plan.name(lang)}</b> - ₹{plan.price}" + (" 🔥" if plan.highlight else "")
+        else:
+            title = f"🔜 <b>{plan.name(lang)}</b> - ₹{plan.price} ({get_text(lang, 'plan_coming_soon')})"
+        blocks.append("\n".join([title] + [f"   • {line}" for line in plan.description_lines(lang)]))
+    blocks.append(get_text(lang, "choose_plan_footer"))
+    return "\n\n".join(blocks)
+
+
+def get_plan_selection_keyboard(lang="en", plans: PlanCatalog = catalog) -> InlineKeyboardMarkup:
+    """Create inline keyboard with plan options (cached per catalog, language and catalog version)."""
+    plans.refresh()
+    return _build_plan_keyboard(plans, lang, plans.version)
+
 
+def get_plan_selection_text(lang="en", plans: PlanCatalog = catalog) -> str:
+    """Render the plan list from a catalog (cached per catalog, language and catalog version)."""
+    plans.refresh()
+    return _build_plan_text(plans, lang, plans.version)
 
+
+@lru_cache(maxsize=None)
 def get_payment_actions_keyboard(lang="en") -> InlineKeyboardMarkup:
-    """Create keyboard for actions during payment."""
+    """Create keyboard for actions during payment (cached per language)."""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text=get_text(lang, "upload_now"), callback_data="upload_now")],
@@ -45,15 +75,15 @@ def get_payment_actions_keyboard(lang="en") -> InlineKeyboardMarkup:
     return keyboard
 
 
-def get_admin_approval_keyboard(user_id: int) -> InlineKeyboardMarkup:
-    """Create admin approval keyboard with user ID embedded."""
+def get_admin_approval_keyboard(bot_id: int, user_id: int) -> InlineKeyboardMarkup:
+    """Create admin approval keyboard with the bot and user ID embedded."""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="✅ Approve", callback_data=f"approve_{user_id}"),
-                InlineKeyboardButton(text="❌ Reject", callback_data=f"reject_{user_id}")
+                InlineKeyboardButton(text="✅ Approve", callback_data=f"approve_{bot_id}_{user_id}"),
+                InlineKeyboardButton(text="❌ Reject", callback_data=f"reject_{bot_id}_{user_id}")
             ],
-            [InlineKeyboardButton(text="📞 Contact User", callback_data=f"contact_{user_id}")]
+            [InlineKeyboardButton(text="📞 Contact User", callback_data=f"contact_{bot_id}_{user_id}")]
         ]
     )
     return keyboard
@@ -66,13 +96,33 @@ def is_valid_email(email: str) -> bool:
 
 
 @premium_router.message(F.text == "🎥 YouTube Premium")
-async def show_premium_plans(message: Message, state: FSMContext, bot: Bot):
+async def show_premium_plans(message: Message, state: FSMContext, bot: Bot, tenant: Tenant):
     """Show YouTube Premium plan options with animation."""
     lang = await get_user_language(state)
+    
+    # Deep review backlog: queue new buyers instead of starting more checkouts
+    admitted, position, wait = admission.admit(message.from_user.id, lang, bot.id)
+    if not admitted:
+        journal.record("waitlisted", message.from_user.id, position=position, bot_id=bot.id)
+        await message.answer(
+            get_text(lang, "waitlist_joined", position, format_wait(lang, wait)),
+            parse_mode="HTML"
+        )
+        return
+    
     await bot.send_chat_action(message.chat.id, ChatAction.TYPING)
     await asyncio.sleep(0.5)
     
     await state.set_state(PremiumStates.waiting_for_plan_selection)
+    journal.record("plans_shown", message.from_user.id, bot_id=bot.id)
+    
+    if EDIT_FLOW:
+        # Starts a new anchored message; no "Loading..." placeholder
+        await show_plans(
+            bot, message.chat.id, state,
+            get_plan_selection_text(lang, tenant.catalog), get_plan_selection_keyboard(lang, tenant.catalog)
+        )
+        return
     
     await message.answer(
         "✨ <b>Loading...</b>",
@@ -81,9 +131,9 @@ async def show_premium_plans(message: Message, state: FSMContext, bot: Bot):
     await asyncio.sleep(0.3)
     
     await message.answer(
-        get_text(lang, "choose_plan"),
+        get_plan_selection_text(lang, tenant.catalog),
         parse_mode="HTML",
-        reply_markup=get_plan_selection_keyboard(lang)
+        reply_markup=get_plan_selection_keyboard(lang, tenant.catalog)
     )
 
 
@@ -92,6 +142,14 @@ async def back_to_main_menu(callback: CallbackQuery, state: FSMContext):
     """Return to main menu."""
     lang = await get_user_language(state)
     await callback.answer(get_text(lang, "back_menu"))
+    
+    if EDIT_FLOW:
+        # The main menu keyboard is already there; just take the flow message away
+        await close_screen(state, callback.message)
+        await state.clear()
+        await state.update_data(language=lang)
+        return
+    
     await state.clear()
     await state.update_data(language=lang) # Preserve language
     
@@ -114,21 +172,30 @@ async def handle_coming_soon(callback: CallbackQuery, state: FSMContext):
 
 
 @premium_router.callback_query(F.data == "cancel_payment")
-async def cancel_payment(callback: CallbackQuery, state: FSMContext):
+async def cancel_payment(callback: CallbackQuery, state: FSMContext, bot: Bot, tenant: Tenant):
     """Cancel payment and return to plans."""
     lang = await get_user_language(state)
     await callback.answer("❌ Cancelled")
     await state.set_state(PremiumStates.waiting_for_plan_selection)
+    journal.record("cancelled", callback.from_user.id, bot_id=bot.id)
+    
+    if EDIT_FLOW:
+        await show_plans(
+            bot, callback.message.chat.id, state,
+            get_plan_selection_text(lang, tenant.catalog), get_plan_selection_keyboard(lang, tenant.catalog),
+            source=callback.message
+        )
+        return
     
     await callback.message.answer(
-        get_text(lang, "choose_plan"),
+        get_plan_selection_text(lang, tenant.catalog),
         parse_mode="HTML",
-        reply_markup=get_plan_selection_keyboard(lang)
+        reply_markup=get_plan_selection_keyboard(lang, tenant.catalog)
     )
 
 
 @premium_router.callback_query(F.data.startswith("plan_"))
-async def process_plan_selection(callback: CallbackQuery, state: FSMContext, bot: Bot):
+async def process_plan_selection(callback: CallbackQuery, state: FSMContext, bot: Bot, tenant: Tenant):
     """Handle plan selection and show QR code with flexible upload."""
     lang = await get_user_language(state)
     await callback.answer("⏳ Processing...")
@@ -136,53 +203,75 @@ async def process_plan_selection(callback: CallbackQuery, state: FSMContext, bot
     await bot.send_chat_action(callback.message.chat.id, ChatAction.UPLOAD_PHOTO)
     await asyncio.sleep(0.5)
     
-    callback_data = callback.data
-    
-    plan_mapping = {
-        "plan_1month_20": ("1 Month YouTube Premium", 20),
-        "plan_3months_55": ("3 Months YouTube Premium", 55)
-    }
-    
-    if callback_data not in plan_mapping:
+    plan = tenant.catalog.get(callback.data)
+    if plan is None or not plan.available:
         await callback.message.answer("❌ Invalid plan selected.")
         return
     
-    plan_name, amount = plan_mapping[callback_data]
+    plan_name, amount = plan.title, plan.price
     
-    timer_end_time = datetime.now() + timedelta(minutes=5)
+    created_at = datetime.now()
+    timer_end_time = created_at + timedelta(minutes=5)
+    reference = orders.new_reference()
     
     await state.update_data(
+        plan_id=plan.id,
+        duration_days=plan.duration_days,
         plan_name=plan_name,
         amount=amount,
+        reference=reference,
+        created_at=created_at.isoformat(),
         timer_end=timer_end_time.isoformat()
     )
     await state.set_state(PremiumStates.viewing_qr)
     
-    qr_buffer = generate_payment_qr(plan_name, amount)
+    qr_buffer = generate_payment_qr(plan_name, amount, reference)
     qr_photo = BufferedInputFile(qr_buffer.read(), filename="payment_qr.png")
     
     timer_text = timer_end_time.strftime('%I:%M %p')
-    caption_text = get_text(lang, "payment_details", plan_name, amount, timer_text)
-    
-    await callback.message.answer_photo(
-        photo=qr_photo,
-        caption=caption_text,
-        parse_mode="HTML",
-        reply_markup=get_payment_actions_keyboard(lang)
+    caption_text = (
+        get_text(lang, "payment_details", plan_name, amount, timer_text)
+        + "\n\n" + get_text(lang, "payment_reference", reference)
     )
     
-    await state.set_state(PremiumStates.timer_running)
+    if EDIT_FLOW:
+        # QR and timer notice in one edit of the plan list message
+        await show_screen(
+            bot, callback.message.chat.id, state, qr_photo,
+            caption_text + "\n\n" + get_text(lang, "timer_started"),
+            get_payment_actions_keyboard(lang),
+            source=callback.message
+        )
+    else:
+        await callback.message.answer_photo(
+            photo=qr_photo,
+            caption=caption_text,
+            parse_mode="HTML",
+            reply_markup=get_payment_actions_keyboard(lang)
+        )
     
-    await callback.message.answer(
-        get_text(lang, "timer_started"),
-        parse_mode="HTML"
+    await state.set_state(PremiumStates.timer_running)
+    journal.record(
+        "plan_selected",
+        callback.from_user.id,
+        plan_id=plan.id,
+        duration_days=plan.duration_days,
+        plan_name=plan_name,
+        amount=amount,
+        reference=reference,
+        lang=lang,
+        bot_id=bot.id
     )
     
-    asyncio.create_task(
-        start_payment_timer(bot, callback.message.chat.id, state, duration=300)
-    )
+    if not EDIT_FLOW:
+        await callback.message.answer(
+            get_text(lang, "timer_started"),
+            parse_mode="HTML"
+        )
     
-    logger.info(f"User {callback.from_user.id} selected plan: {plan_name} (₹{amount})")
+    schedule_payment_timer(bot, callback.message.chat.id, state, duration=300)
+    
+    logger.info("User %s selected plan: %s (₹%s) ref %s", callback.from_user.id, plan_name, amount, reference)
 
 
 @premium_router.callback_query(F.data == "upload_now")
@@ -225,6 +314,7 @@ async def handle_payment_screenshot(message: Message, state: FSMContext, bot: Bo
     # SAVE PHOTO and Ask for Email
     await state.update_data(screenshot_file_id=photo_file_id)
     await state.set_state(PremiumStates.waiting_for_email)
+    journal.record("screenshot_received", message.from_user.id, screenshot_file_id=photo_file_id, bot_id=bot.id)
     
     await message.answer(
         get_text(lang, "screenshot_received"),
@@ -233,7 +323,7 @@ async def handle_payment_screenshot(message: Message, state: FSMContext, bot: Bo
 
 
 @premium_router.message(StateFilter(PremiumStates.waiting_for_email), F.text)
-async def handle_email_submission(message: Message, state: FSMContext, bot: Bot):
+async def handle_email_submission(message: Message, state: FSMContext, bot: Bot, tenant: Tenant):
     """Handle Email ID submission and Send to Admin."""
     lang = await get_user_language(state)
     email = message.text.strip()
@@ -253,6 +343,7 @@ async def handle_email_submission(message: Message, state: FSMContext, bot: Bot)
     plan_name = user_data.get("plan_name", "Unknown")
     amount = user_data.get("amount", 0)
     photo_file_id = user_data.get("screenshot_file_id")
+    reference = user_data.get("reference") or orders.new_reference()
     
     user_id = message.from_user.id
     username = message.from_user.username or "No username"
@@ -268,18 +359,47 @@ async def handle_email_submission(message: Message, state: FSMContext, bot: Bot)
         f"💎 <b>ORDER DETAILS</b>\n"
         f"📦 Plan: <b>{plan_name}</b>\n"
         f"💰 Paid: <b>₹{amount}</b>\n"
+        f"🔖 Ref: <code>{reference}</code>\n"
         f"📧 Email: <b>{email}</b>\n"
         f"📅 Time: {datetime.now().strftime('%d %b %Y, %I:%M %p')}\n\n"
         f"👇 <i>Review screenshot & Approve</i>"
     )
     
     try:
-        await bot.send_photo(
-            chat_id=ADMIN_ID,
+        admin_notice = await bot.send_photo(
+            chat_id=tenant.admin_id,
             photo=photo_file_id,
             caption=admin_message,
             parse_mode="HTML",
-            reply_markup=get_admin_approval_keyboard(user_id)
+            reply_markup=get_admin_approval_keyboard(bot.id, user_id)
+        )
+        
+        # Register the order so payments can be reconciled against it
+        submitted_at = datetime.now()
+        created_at = user_data.get("created_at")
+        orders.add(Order(
+            user_id=user_id,
+            plan_name=plan_name,
+            amount=amount,
+            created_at=datetime.fromisoformat(created_at) if created_at else submitted_at,
+            submitted_at=submitted_at,
+            plan_id=user_data.get("plan_id", ""),
+            duration_days=user_data.get("duration_days", 30),
+            email=email,
+            screenshot_file_id=photo_file_id,
+            lang=lang,
+            bot_id=bot.id,
+            reference=reference,
+            admin_message_id=admin_notice.message_id,
+            admin_caption=admin_message
+        ))
+        journal.record(
+            "email_received",
+            user_id,
+            email=email,
+            admin_message_id=admin_notice.message_id,
+            admin_caption=admin_message,
+            bot_id=bot.id
         )
         
         # User Notification
@@ -288,10 +408,10 @@ async def handle_email_submission(message: Message, state: FSMContext, bot: Bot)
             parse_mode="HTML"
         )
         
-        logger.info(f"Premium request sent to admin for user {user_id}")
+        logger.info("Premium request sent to admin for user %s", user_id)
         
     except Exception as e:
-        logger.error(f"Failed to notify admin: {e}", exc_info=True)
+        logger.error("Failed to notify admin: %s", e, exc_info=True)
         await message.answer("⚠️ Error processing request. Please contact support.")
 
 
@@ -1,17 +1,22 @@
-from aiogram import Router, F
+from aiogram import Bot, Router, F
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.context import FSMContext
 import asyncio
+from functools import lru_cache
 
 # Imports for Language System
 from utils.translations import get_text, get_language_keyboard
 from handlers.language import get_user_language
+from utils.journal import journal
+from utils.subscriptions import subscriptions
+from utils.tenants import Tenant
 
 start_router = Router()
 
+@lru_cache(maxsize=None)
 def get_main_menu_keyboard(lang: str = "en") -> ReplyKeyboardMarkup:
-    """Create main menu keyboard with translated options."""
+    """Create main menu keyboard with translated options (cached per language)."""
     # FIX: Use distinct keys for BUTTONS (e.g., 'btn_help' instead of just 'help')
     # This prevents the button from showing a long help message, 
     # and allows the handler to fetch the correct message text later.
@@ -72,35 +77,36 @@ async def cmd_help(message: Message, state: FSMContext):
 
 @start_router.message(Command("status"))
 @start_router.message(F.text.in_(["📊 My Status", "📊 मेरी स्थिति", "📊 আমার স্ট্যাটাস"]))
-async def cmd_status(message: Message, state: FSMContext):
+async def cmd_status(message: Message, state: FSMContext, bot: Bot):
     """Show status."""
     lang = await get_user_language(state)
-    
-    # FIX: Use a message key for the status header/body
     status_header = get_text(lang, "msg_status_header")
-    
-    # Mocking status check logic
-    await message.answer(f"{status_header}: Active ✅\nUser ID: {message.from_user.id}", parse_mode="HTML")
+
+    # Direct lookup in the subscription store, no scan over orders
+    subscription = subscriptions.get(bot.id, message.from_user.id)
+    if subscription is None:
+        status = get_text(lang, "status_none")
+    elif subscription.active:
+        status = get_text(lang, "status_active", subscription.expires_at.strftime('%d %b %Y'), subscription.plan_name)
+    else:
+        status = get_text(lang, "status_expired", subscription.expires_at.strftime('%d %b %Y'))
+
+    await message.answer(f"{status_header}\n\n{status}\nUser ID: {message.from_user.id}", parse_mode="HTML")
 
 @start_router.message(Command("support"))
 @start_router.message(F.text.in_(["💬 Support", "💬 सहायता", "💬 সাপোর্ট"]))
-async def cmd_support(message: Message, state: FSMContext):
-    """Show support contact."""
-    # Ensure you handle the import safely or define SUPPORT_BOT
-    try:
-        from config import SUPPORT_BOT
-    except ImportError:
-        SUPPORT_BOT = "Admin"
-
+async def cmd_support(message: Message, state: FSMContext, tenant: Tenant):
+    """Show this bot's support contact."""
     lang = await get_user_language(state)
     
     # Use 'msg_support' for the text body
-    support_msg = get_text(lang, "msg_support", SUPPORT_BOT, message.from_user.id)
+    support_msg = get_text(lang, "msg_support", tenant.support_bot, message.from_user.id)
     await message.answer(support_msg, parse_mode="HTML")
 
 @start_router.message(Command("cancel"))
-async def cmd_cancel(message: Message, state: FSMContext):
+async def cmd_cancel(message: Message, state: FSMContext, bot: Bot):
     lang = await get_user_language(state)
     await state.clear()
+    journal.record("cancelled", message.from_user.id, bot_id=bot.id)
     await message.answer("❌ Cancelled", reply_markup=get_main_menu_keyboard(lang))
 
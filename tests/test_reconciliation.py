@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from utils.orders import Order
+from utils.reconciliation import CreditLedger, reconcile_statement
+
+WINDOW = timedelta(minutes=30)
+SUBMITTED = datetime(2026, 9, 1, 10, 0)
+
+
+def make_order(user_id: int, reference: str, amount: int = 20) -> Order:
+    return Order(
+        user_id=user_id,
+        plan_name="1 Month",
+        amount=amount,
+        created_at=SUBMITTED - timedelta(minutes=5),
+        submitted_at=SUBMITTED,
+        reference=reference,
+    )
+
+
+def write_statement(tmp_path, rows):
+    path = tmp_path / "statement.csv"
+    path.write_text("Date,Amount,Remarks\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_reimported_statement_does_not_approve_again(tmp_path):
+    path = write_statement(tmp_path, ["01/09/2026 10:02,20,UPI/412345678901/FB000001"])
+    ledger = CreditLedger(str(tmp_path / "ledger.txt"))
+
+    first = reconcile_statement(path, [make_order(1, "FB000001")], WINDOW, ledger)
+    assert [order.user_id for _, order in first.matched] == [1]
+    ledger.add(first.matched[0][0].fingerprint)
+
+    # User 1 is approved; user 2 waits with the same amount
+    reloaded = CreditLedger(str(tmp_path / "ledger.txt"))
+    second = reconcile_statement(path, [make_order(2, "FB000002")], WINDOW, reloaded)
+    assert second.matched == []
+    assert second.already_used == 1
+
+
+def test_reimport_without_utr_is_recognised_by_row(tmp_path):
+    path = write_statement(tmp_path, ["01/09/2026,20,", "01/09/2026,20,"])
+    ledger = CreditLedger(str(tmp_path / "ledger.txt"))
+
+    first = reconcile_statement(path, [make_order(1, "FB000001")], WINDOW, ledger)
+    assert len(first.matched) == 1
+    ledger.add(first.matched[0][0].fingerprint)
+
+    # The second identical row is a different payment and is still available
+    second = reconcile_statement(path, [make_order(2, "FB000002")], WINDOW, ledger)
+    assert [order.user_id for _, order in second.matched] == [2]
+    assert second.already_used == 1
+
+
+def test_stale_reference_goes_to_manual_review(tmp_path):
+    path = write_statement(tmp_path, ["01/09/2026 10:02,20,UPI/412345678901/FB000001"])
+
+    report = reconcile_statement(path, [make_order(2, "FB000002")], WINDOW)
+    assert report.matched == []
+    assert [credit.line for credit in report.unresolved] == [2]
+
+
+def test_reference_with_wrong_amount_goes_to_manual_review(tmp_path):
+    path = write_statement(tmp_path, ["01/09/2026 10:02,25,FB000001"])
+
+    report = reconcile_statement(path, [make_order(1, "FB000001"), make_order(2, "FB000002", 25)], WINDOW)
+    assert report.matched == []
+    assert len(report.unresolved) == 1
+
+
+def test_credit_without_reference_matches_on_amount(tmp_path):
+    path = write_statement(tmp_path, ["01/09/2026,20,"])
+
+    report = reconcile_statement(path, [make_order(1, "FB000001")], WINDOW)
+    assert [order.user_id for _, order in report.matched] == [1]
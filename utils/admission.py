@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.methods import SendMessage
+
+from config import ADMISSION_MAX_BACKLOG, ADMISSION_INVITE_MINUTES
+from utils.orders import orders
+from utils.outbox import deliver
+from utils.timer import running_timers
+from utils.translations import get_text
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """
+    Bounds the number of checkouts in progress while the review backlog is deep.
+
+    The backlog is orders waiting for a decision plus checkouts still
+    running their payment timer. Above `max_backlog`, new buyers join a
+    FIFO waitlist instead of getting a QR code. Whenever room frees up the
+    first users in line are invited back and get `invite_seconds` to
+    start their checkout before their spot goes to the next user.
+
+    The waiting time shown to users comes from the approval throughput
+    of the last `window` seconds.
+    """
+
+    def __init__(self, max_backlog: int, invite_seconds: float, window: float = 3600.0):
+        self.max_backlog = max_backlog
+        self.invite_seconds = invite_seconds
+        self.window = window
+        # (bot ID, user ID) -> language; a user waits separately in each bot
+        self._waitlist: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+        self._invited: Dict[Tuple[int, int], float] = {}
+        self._decisions: Deque[float] = deque()
+        self.turned_away = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_backlog > 0
+
+    @staticmethod
+    def backlog() -> int:
+        return len(orders.pending()) + running_timers()
+
+    def _expire_invites(self, now: float) -> None:
+        for key, deadline in list(self._invited.items()):
+            if deadline < now:
+                del self._invited[key]
+
+    def capacity(self) -> int:
+        """Checkouts that can start now without passing the limit."""
+        self._expire_invites(time.monotonic())
+        return self.max_backlog - self.backlog() - len(self._invited)
+
+    def record_decision(self) -> None:
+        """Count a decided order towards the throughput estimate."""
+        now = time.monotonic()
+        self._decisions.append(now)
+        while self._decisions and self._decisions[0] < now - self.window:
+            self._decisions.popleft()
+
+    def throughput(self) -> float:
+        """Decisions per second over the last window."""
+        now = time.monotonic()
+        while self._decisions and self._decisions[0] < now - self.window:
+            self._decisions.popleft()
+        return len(self._decisions) / self.window
+
+    def admit(self, user_id: int, lang: str, bot_id: int = 0) -> Tuple[bool, int, Optional[float]]:
+        """
+        Decide whether a user may start a checkout now.
+
+        Users turned away are put on the waitlist (once) and keep their place.
+
+        Returns:
+            tuple: (admitted, position in line starting at 1, estimated wait in seconds or None)
+        """
+        if not self.enabled:
+            return True, 0, None
+        key = (bot_id, user_id)
+        if self._invited.pop(key, None) is not None:
+            return True, 0, None
+        if not self._waitlist and self.capacity() > 0:
+            return True, 0, None
+
+        if key not in self._waitlist:
+            self._waitlist[key] = lang
+            self.turned_away += 1
+        position = list(self._waitlist).index(key) + 1
+        return False, position, self.eta(position)
+
+    def eta(self, position: int) -> Optional[float]:
+        """Seconds until the user at `position` is likely invited, or None without recent approvals."""
+        rate = self.throughput()
+        if rate == 0:
+            return None
+        # Everyone ahead needs a free slot, and slots free up as orders are decided
+        return max(position - max(self.capacity(), 0), 1) / rate
+
+    async def release(self, get_bot: Callable[[int], Bot]) -> int:
+        """
+        Invite as many users from the front of the waitlist as there is room for.
+
+        Each user is invited by the bot they are waiting in, from `get_bot`.
+
+        Returns:
+            int: Number of users invited
+        """
+        invited = 0
+        while self._waitlist and self.capacity() > 0:
+            (bot_id, user_id), lang = self._waitlist.popitem(last=False)
+            self._invited[bot_id, user_id] = time.monotonic() + self.invite_seconds
+            invited += 1
+            try:
+                await deliver(get_bot(bot_id), SendMessage(
+                    chat_id=user_id,
+                    text=get_text(lang, "waitlist_resume", int(self.invite_seconds // 60)),
+                    parse_mode="HTML"
+                ))
+            except Exception as e:
+                logger.warning("Could not invite user %s from the waitlist: %s", user_id, e)
+        return invited
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backlog": self.backlog(),
+            "max_backlog": self.max_backlog,
+            "waitlist": len(self._waitlist),
+            "invited": len(self._invited),
+            "approvals_per_hour": round(self.throughput() * 3600, 1),
+            "turned_away": self.turned_away,
+        }
+
+
+admission = AdmissionController(ADMISSION_MAX_BACKLOG, ADMISSION_INVITE_MINUTES * 60)
+
+
+def format_wait(lang: str, seconds: Optional[float]) -> str:
+    """Human-readable estimated wait for the waitlist message."""
+    if seconds is None:
+        return get_text(lang, "waitlist_eta_unknown")
+    return get_text(lang, "waitlist_eta_minutes", max(round(seconds / 60), 1))
+
+
+async def run_admission_release(get_bot: Callable[[int], Bot], interval: float = 15.0) -> None:
+    """Invite waiting users whenever room frees up, until cancelled."""
+    while True:
+        try:
+            invited = await admission.release(get_bot)
+            if invited:
+                logger.info("Invited %d users from the waitlist", invited)
+        except Exception as e:
+            logger.error("Waitlist release failed: %s", e, exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,156 @@
+import asyncio
+import html
+import os
+import sys
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from config import DIAGNOSTICS_ENABLED
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate memory held by `obj`, following dicts, lists, tuples and sets."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def resident_memory_mb() -> Optional[float]:
+    """Current resident set size, where /proc is available."""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+
+
+class MemoryDiagnostics:
+    """
+    On-demand memory report for admins.
+
+    Nothing is collected until a report is requested, and allocation
+    tracing (tracemalloc) is only switched on when diagnostics are enabled,
+    so a disabled instance pays nothing. Each report compares allocations
+    with the previous report, which makes slow growth easy to spot: ask for
+    a report, wait, ask again.
+
+    Other modules register what they want counted with `add_source`.
+    """
+
+    def __init__(self, enabled: bool, top_n: int = 15, frames: int = 1):
+        self.enabled = enabled
+        self.top_n = top_n
+        self.frames = frames
+        self.storage = None
+        self._sources: Dict[str, Callable[[], int]] = {}
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        """Start allocation tracing and take the first snapshot, if enabled."""
+        if not self.enabled or tracemalloc.is_tracing():
+            return
+        tracemalloc.start(self.frames)
+        self._snapshot = tracemalloc.take_snapshot()
+
+    def add_source(self, name: str, size: Callable[[], int]) -> None:
+        """Report `size()` under `name`, e.g. the number of entries in a cache."""
+        self._sources[name] = size
+
+    def storage_stats(self) -> Dict[str, Any]:
+        """Entry counts and estimated size of the in-memory FSM storage."""
+        records = getattr(self.storage, "storage", None)
+        if records is None:
+            return {"type": type(self.storage).__name__}
+
+        with_state = with_data = empty = 0
+        size = sys.getsizeof(records)
+        for key, record in list(records.items()):
+            with_state += record.state is not None
+            with_data += bool(record.data)
+            empty += record.state is None and not record.data
+            size += sys.getsizeof(key) + sys.getsizeof(record) + deep_sizeof(record.data)
+        return {
+            "entries": len(records),
+            "with_state": with_state,
+            "with_data": with_data,
+            # Reading an unknown key creates a record, so these pile up
+            "empty": empty,
+            "estimated_kb": round(size / 1024, 1),
+        }
+
+    @staticmethod
+    def task_stats() -> Dict[str, int]:
+        """Live asyncio tasks grouped by coroutine name, largest groups first."""
+        names = Counter(task.get_coro().__qualname__ for task in asyncio.all_tasks())
+        return dict(names.most_common())
+
+    def allocation_diff(self) -> List[str]:
+        """Top allocation changes since the previous report."""
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            stats = snapshot.statistics("lineno")
+        else:
+            stats = snapshot.compare_to(previous, "lineno")
+        return [str(stat) for stat in stats[:self.top_n]]
+
+    def collect(self) -> Dict[str, Any]:
+        """Counters that must be read on the event loop thread."""
+        return {
+            "rss_mb": resident_memory_mb(),
+            "fsm_storage": self.storage_stats(),
+            "tasks": self.task_stats(),
+            "sizes": {name: size() for name, size in self._sources.items()},
+        }
+
+    async def report(self) -> Dict[str, Any]:
+        """Full report; the allocation diff is computed in a worker thread."""
+        report = self.collect()
+        report["allocations"] = await asyncio.to_thread(self.allocation_diff)
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["traced_mb"] = {"current": round(current / 1024 / 1024, 1), "peak": round(peak / 1024 / 1024, 1)}
+        return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a report for the admin chat (HTML)."""
+    storage = report["fsm_storage"]
+    lines = [
+        "🧠 <b>MEMORY DIAGNOSTICS</b>\n",
+        f"RSS: <b>{report['rss_mb']} MB</b>",
+    ]
+    if "traced_mb" in report:
+        lines.append(f"Traced: {report['traced_mb']['current']} MB (peak {report['traced_mb']['peak']} MB)")
+
+    lines.append("\n<b>FSM storage</b>")
+    lines.extend(f"• {name}: {value}" for name, value in storage.items())
+
+    lines.append("\n<b>Tasks</b>")
+    lines.extend(f"• {html.escape(name)}: {count}" for name, count in list(report["tasks"].items())[:10])
+
+    lines.append("\n<b>Sizes</b>")
+    lines.extend(f"• {name}: {size}" for name, size in report["sizes"].items())
+
+    if report["allocations"]:
+        lines.append("\n<b>Allocation changes</b>")
+        lines.extend(f"<code>{html.escape(line[-120:])}</code>" for line in report["allocations"])
+    return "\n".join(lines)
+
+
+diagnostics = MemoryDiagnostics(DIAGNOSTICS_ENABLED)
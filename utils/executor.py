@@ -0,0 +1,78 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class _UserQueue:
+    __slots__ = ("lock", "size")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.size = 0
+
+
+class UserSerialExecutor(BaseMiddleware):
+    """
+    Run each user's updates one at a time, and different users in parallel.
+
+    Every user gets a lock created on their first update and dropped as
+    soon as their queue is empty, so idle users cost nothing. asyncio
+    locks wake waiters in FIFO order, which keeps a user's updates in the
+    order they arrived. A global semaphore caps how many updates run at
+    once; it is only taken after the user's lock, so queued updates never
+    hold a slot other users could use.
+
+    Registered as an outer middleware on `dp.update`.
+    """
+
+    def __init__(self, max_concurrency: int = 100):
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._queues: Dict[int, _UserQueue] = {}
+        self.running = 0
+        self.max_queue_seen = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Current queue metrics."""
+        sizes = [queue.size for queue in self._queues.values()]
+        return {
+            "active_users": len(sizes),
+            "updates_waiting": sum(q.size - q.lock.locked() for q in self._queues.values()),
+            "longest_queue": max(sizes, default=0),
+            "longest_queue_seen": self.max_queue_seen,
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            async with self._slots:
+                return await handler(event, data)
+
+        queue = self._queues.get(user.id)
+        if queue is None:
+            queue = self._queues[user.id] = _UserQueue()
+        queue.size += 1
+        if queue.size > self.max_queue_seen:
+            self.max_queue_seen = queue.size
+
+        try:
+            async with queue.lock:
+                async with self._slots:
+                    self.running += 1
+                    try:
+                        return await handler(event, data)
+                    finally:
+                        self.running -= 1
+        finally:
+            queue.size -= 1
+            if queue.size == 0 and self._queues.get(user.id) is queue:
+                del self._queues[user.id]
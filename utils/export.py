@@ -0,0 +1,302 @@
+import argparse
+import csv
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from utils.journal import EventJournal, ORDER_STATUS
+
+logger = logging.getLogger(__name__)
+
+ORDER_FIELDS = [
+    "reference", "user_id", "bot_id", "plan_id", "plan_name", "amount", "status", "lang", "email",
+    "created_at", "submitted_at", "decided_at", "decided_by", "expires_at",
+]
+USER_FIELDS = [
+    "user_id", "bot_id", "lang", "first_seen", "last_seen", "orders", "approved", "rejected",
+    "spent", "plan_name", "expires_at",
+]
+FORMATS = ("csv", "ndjson")
+
+# Statuses after which an order can no longer change
+FINAL_STATUSES = {"approved", "rejected", "cancelled"}
+
+# Checkouts not yet submitted that saw no event for this long are written as they stand
+ABANDON_AFTER = timedelta(days=7)
+# How many events pass between sweeps for abandoned checkouts
+SWEEP_EVERY = 10000
+
+
+def iter_orders(
+    events: Iterable[Dict[str, Any]],
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    default_bot_id: int = 0,
+    abandon_after: timedelta = ABANDON_AFTER
+) -> Iterator[Dict[str, Any]]:
+    """
+    Turn a journal event stream into one row per order.
+
+    An order is emitted as soon as it is final, when the user starts a new
+    one with the same bot, or when it was never submitted and has seen no
+    event for `abandon_after`; later events of such an order are ignored.
+    Memory is therefore bounded by the orders submitted and waiting for a
+    decision plus the checkouts started within `abandon_after`, not by
+    the number of users. Orders in progress at the end of the journal are
+    emitted last.
+
+    Args:
+        events: Journal events in sequence order
+        since: Only orders created at or after this ISO date/time
+        until: Only orders created before this ISO date/time
+        default_bot_id: Bot of events written before the bot ID was
+            recorded, as in the journal projection
+        abandon_after: Idle time after which an unsubmitted checkout is final
+
+    Yields:
+        dict: Order rows with the keys of ORDER_FIELDS
+    """
+    def wanted(order: Dict[str, Any]) -> bool:
+        created = order["created_at"]
+        return (since is None or created >= since) and (until is None or created < until)
+
+    # Keyed by (bot ID, user ID): a user can have an order in progress with each bot
+    open_orders: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    # Time of the latest event of each open order, to find abandoned checkouts
+    last_seen: Dict[Tuple[int, int], str] = {}
+
+    for count, event in enumerate(events, 1):
+        if count % SWEEP_EVERY == 0:
+            # ISO timestamps compare correctly as strings
+            cutoff = (datetime.fromisoformat(event["ts"]) - abandon_after).isoformat()
+            for key in [key for key, seen in last_seen.items() if seen < cutoff]:
+                if open_orders[key]["status"] != "pending":
+                    del last_seen[key]
+                    order = open_orders.pop(key)
+                    if wanted(order):
+                        yield order
+
+        kind = event["type"]
+        user_id = event.get("user_id")
+        if user_id is None:
+            continue
+        bot_id = event.get("bot_id") or default_bot_id
+        key = (bot_id, user_id)
+
+        if kind == "plan_selected":
+            previous = open_orders.pop(key, None)
+            if previous is not None and wanted(previous):
+                yield previous
+            last_seen[key] = event["ts"]
+            open_orders[key] = {
+                "user_id": user_id,
+                "bot_id": bot_id,
+                "reference": event.get("reference", ""),
+                "plan_id": event.get("plan_id", ""),
+                "plan_name": event.get("plan_name", ""),
+                "amount": event.get("amount", 0),
+                "lang": event.get("lang", ""),
+                "status": "selected",
+                "created_at": event["ts"],
+            }
+            continue
+
+        order = open_orders.get(key)
+        if order is None or kind not in ORDER_STATUS:
+            continue
+        last_seen[key] = event["ts"]
+        if kind == "cancelled" and order["status"] == "pending":
+            # Same rule as the projection: cancelling does not withdraw a submitted order
+            continue
+
+        order["status"] = ORDER_STATUS[kind]
+        if kind == "email_received":
+            order["email"] = event.get("email", "")
+            order["submitted_at"] = event["ts"]
+        elif kind in ("approved", "rejected"):
+            order["decided_at"] = event["ts"]
+            order["decided_by"] = event.get("decided_by", "")
+            order["expires_at"] = event.get("expires_at", "")
+
+        if order["status"] in FINAL_STATUSES:
+            del open_orders[key]
+            del last_seen[key]
+            if wanted(order):
+                yield order
+
+    for order in open_orders.values():
+        if wanted(order):
+            yield order
+
+
+def iter_users(events: Iterable[Dict[str, Any]], default_bot_id: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Turn a journal event stream into one row per user and bot.
+
+    Unlike orders, a user's row is only complete at the end of the journal,
+    so memory is not constant: one compact record (a ten-item list, a few
+    hundred bytes) is held per user and bot until then. A million users
+    take a few hundred megabytes; export orders instead where that is too
+    much. Users cannot be limited to a period.
+
+    Args:
+        events: Journal events in sequence order
+        default_bot_id: Bot of events written before the bot ID was
+            recorded, as in the journal projection
+
+    Yields:
+        dict: User rows with the keys of USER_FIELDS
+    """
+    # (bot_id, user_id) -> [lang, first_seen, last_seen, orders, approved, rejected, spent, plan_name, expires_at, selection]
+    users: Dict[Tuple[int, int], list] = {}
+
+    for event in events:
+        user_id = event.get("user_id")
+        if user_id is None:
+            continue
+        key = (event.get("bot_id") or default_bot_id, user_id)
+        user = users.get(key)
+        if user is None:
+            user = users[key] = ["", event["ts"], "", 0, 0, 0, 0, "", "", None]
+        user[2] = event["ts"]
+
+        kind = event["type"]
+        if kind == "plan_selected":
+            user[0] = event.get("lang", user[0])
+            user[3] += 1
+            # Plan and price of the latest selection, credited on approval
+            user[9] = (event.get("plan_name", ""), event.get("amount", 0))
+        elif kind == "approved":
+            plan_name, amount = user[9] or ("", 0)
+            user[4] += 1
+            user[6] += amount
+            user[7] = plan_name
+            user[8] = event.get("expires_at", user[8])
+        elif kind == "rejected":
+            user[5] += 1
+
+    for (bot_id, user_id), user in users.items():
+        yield dict(zip(USER_FIELDS, [user_id, bot_id, *user[:9]]))
+
+
+def write_rows(rows: Iterable[Dict[str, Any]], fields: List[str], file: IO[str], fmt: str, chunk_size: int = 1000) -> int:
+    """
+    Write rows as CSV or NDJSON in chunks of `chunk_size`.
+
+    Returns:
+        int: Number of rows written
+    """
+    count = 0
+    chunk: List[Dict[str, Any]] = []
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(file, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+
+    def write_chunk() -> None:
+        if writer is not None:
+            writer.writerows(chunk)
+        else:
+            file.write("".join(json.dumps({k: row.get(k) for k in fields}, ensure_ascii=False) + "\n" for row in chunk))
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            write_chunk()
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        write_chunk()
+        count += len(chunk)
+    return count
+
+
+def export(
+    source: EventJournal,
+    kind: str,
+    path: str,
+    fmt: str = "csv",
+    compress: bool = False,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    default_bot_id: int = 0
+) -> int:
+    """
+    Stream an export of orders or users from the journal to a file.
+
+    Events are read one segment line at a time, so memory does not grow
+    with the size of the journal; see `iter_orders` and `iter_users` for
+    what each export holds. Blocking; run it in a thread from the bot.
+
+    Args:
+        source: Journal to read
+        kind: "orders" or "users"
+        path: Output file
+        fmt: "csv" or "ndjson"
+        compress: Write gzip
+        since: Only orders created at or after this ISO date/time
+        until: Only orders created before this ISO date/time
+        default_bot_id: Bot of events written before the bot ID was recorded
+
+    Returns:
+        int: Number of rows written
+
+    Raises:
+        ValueError: If the kind or format is unknown, or a period is given for users
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    if kind == "orders":
+        rows, fields = iter_orders(source.replay(), since, until, default_bot_id), ORDER_FIELDS
+    elif kind == "users":
+        if since or until:
+            raise ValueError("A period can only be given for orders")
+        rows, fields = iter_users(source.replay(), default_bot_id), USER_FIELDS
+    else:
+        raise ValueError(f"Unknown export: {kind}")
+
+    opener = gzip.open if compress else open
+    with opener(path, "wt", encoding="utf-8", newline="") as file:
+        count = write_rows(rows, fields, file, fmt)
+    logger.info("Exported %d %s to %s", count, kind, path)
+    return count
+
+
+def main() -> None:
+    # JOURNAL_DIR is read directly; importing config would demand the bot's credentials
+    journal_dir = os.getenv("JOURNAL_DIR")
+    # The main bot's ID is the part of its token before the colon, if the token is at hand
+    token = os.getenv("BOT_TOKEN", "")
+    main_bot_id = int(token.split(":", 1)[0]) if token.split(":", 1)[0].isdigit() else 0
+
+    parser = argparse.ArgumentParser(description="Export orders or users from the payment journal.")
+    parser.add_argument("kind", choices=["orders", "users"])
+    parser.add_argument("output", help="Output file; a .gz suffix turns on gzip")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--since", help="Orders created at or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Orders created before this date (YYYY-MM-DD)")
+    parser.add_argument(
+        "--journal-dir", default=journal_dir, required=journal_dir is None,
+        help="Journal directory (default: $JOURNAL_DIR)"
+    )
+    parser.add_argument(
+        "--default-bot-id", type=int, default=main_bot_id,
+        help="Bot of events recorded before bot IDs were stored (default: from $BOT_TOKEN, else 0)"
+    )
+    args = parser.parse_args()
+    if args.kind == "users" and (args.since or args.until):
+        parser.error("--since and --until only apply to orders")
+
+    count = export(
+        EventJournal(args.journal_dir), args.kind, args.output, args.format,
+        compress=args.output.endswith(".gz"), since=args.since, until=args.until,
+        default_bot_id=args.default_bot_id
+    )
+    print(f"Exported {count} {args.kind} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import io
+import logging
+from functools import lru_cache
+from typing import Dict, Optional, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.types import BufferedInputFile, InlineKeyboardMarkup, InputMediaPhoto, Message
+
+from config import FLOW_MODE
+
+logger = logging.getLogger(__name__)
+
+# With FLOW_MODE=edit the checkout runs in one photo message per user that
+# is edited from screen to screen; otherwise every step posts new messages.
+# Every screen is a photo because Telegram cannot turn a text message into one.
+EDIT_FLOW = FLOW_MODE == "edit"
+
+ANCHOR_KEY = "anchor_message_id"
+
+# Telegram file ID of the uploaded plan banner, per bot, so it is uploaded once
+_banner_file_ids: Dict[int, str] = {}
+
+
+@lru_cache(maxsize=1)
+def banner_png() -> bytes:
+    """Banner shown above the plan list (PNG bytes)."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", (800, 300), (204, 0, 0))
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=56)
+    except TypeError:  # Pillow < 10.1 has a single bitmap size
+        font = ImageFont.load_default()
+    draw.text((400, 150), "YouTube Premium", fill="white", font=font, anchor="mm")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+async def show_screen(
+    bot: Bot,
+    chat_id: int,
+    state: FSMContext,
+    photo: Union[str, BufferedInputFile],
+    caption: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    source: Optional[Message] = None
+) -> Optional[Message]:
+    """
+    Show a screen in the user's anchored message.
+
+    When the button pressed (`source`) is on the anchored message, that
+    message's photo, caption and keyboard are replaced in a single call.
+    Otherwise - a new flow, or a button on an old message - the screen is
+    sent as a new message, which becomes the anchor.
+
+    Returns:
+        Message: The message showing the screen, or None if it was unchanged
+    """
+    anchor_id = (await state.get_data()).get(ANCHOR_KEY)
+    if source is not None and source.message_id == anchor_id and source.photo:
+        try:
+            result = await bot.edit_message_media(
+                chat_id=chat_id,
+                message_id=anchor_id,
+                media=InputMediaPhoto(media=photo, caption=caption, parse_mode="HTML"),
+                reply_markup=reply_markup
+            )
+            return result if isinstance(result, Message) else None
+        except TelegramBadRequest as e:
+            if "not modified" in str(e):
+                return None
+            logger.debug("Anchor %s not editable, sending a new one: %s", anchor_id, e)
+
+    message = await bot.send_photo(
+        chat_id=chat_id,
+        photo=photo,
+        caption=caption,
+        parse_mode="HTML",
+        reply_markup=reply_markup
+    )
+    await state.update_data(**{ANCHOR_KEY: message.message_id})
+    return message
+
+
+async def show_plans(
+    bot: Bot,
+    chat_id: int,
+    state: FSMContext,
+    caption: str,
+    reply_markup: InlineKeyboardMarkup,
+    source: Optional[Message] = None
+) -> None:
+    """Show the plan list screen under the banner."""
+    photo = _banner_file_ids.get(bot.id) or BufferedInputFile(banner_png(), filename="plans.png")
+    message = await show_screen(bot, chat_id, state, photo, caption, reply_markup, source)
+    if message is not None and message.photo and bot.id not in _banner_file_ids:
+        _banner_file_ids[bot.id] = message.photo[-1].file_id
+
+
+async def close_screen(state: FSMContext, source: Message) -> None:
+    """Remove the anchored message when the user leaves the flow."""
+    if source.message_id != (await state.get_data()).get(ANCHOR_KEY):
+        return
+    try:
+        await source.delete()
+    except TelegramBadRequest as e:
+        # Messages older than 48 hours cannot be deleted; drop the buttons instead
+        logger.debug("Could not delete anchor: %s", e)
+        await source.edit_reply_markup(reply_markup=None)
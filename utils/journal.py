@@ -0,0 +1,310 @@
+import asyncio
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.runtime import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "segment-"
+SNAPSHOT_PREFIX = "snapshot-"
+
+# Order status after each lifecycle event; other events are only counted
+ORDER_STATUS = {
+    "timer_expired": "awaiting_screenshot",
+    "screenshot_received": "awaiting_email",
+    "email_received": "pending",
+    "approved": "approved",
+    "rejected": "rejected",
+    "cancelled": "cancelled",
+}
+
+
+class OrderProjection:
+    """
+    Order state and analytics rebuilt from journal events.
+
+    Keeps the latest order and subscription of every user with every bot
+    plus running counters, which is all a snapshot needs to hold for a
+    fast restart. Records are keyed by (bot ID, user ID); events written
+    before the bot ID was recorded belong to `default_bot_id`.
+    """
+
+    def __init__(self, default_bot_id: int = 0):
+        self.default_bot_id = default_bot_id
+        self.seq = 0
+        self.orders: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.subscriptions: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.counts: Counter = Counter()
+        self.revenue = 0
+
+    def _key(self, record: Dict[str, Any]) -> Tuple[int, int]:
+        return record.get("bot_id") or self.default_bot_id, record["user_id"]
+
+    def apply(self, event: Dict[str, Any]) -> None:
+        """Fold one event into the projection."""
+        self.seq = event["seq"]
+        kind = event["type"]
+        self.counts[kind] += 1
+
+        user_id = event.get("user_id")
+        if user_id is None:
+            return
+
+        key = self._key(event)
+        fields = {k: v for k, v in event.items() if k not in ("seq", "ts", "type", "user_id", "bot_id")}
+        if kind == "renewal_reminded":
+            if key in self.subscriptions:
+                self.subscriptions[key]["reminded"] = True
+            return
+        if kind == "plan_selected":
+            # A new plan selection starts a new order for the user with this bot
+            self.orders[key] = {
+                "user_id": user_id, "bot_id": key[0], "status": "selected", "created_at": event["ts"], **fields
+            }
+            return
+
+        order = self.orders.get(key)
+        if order is None or kind not in ORDER_STATUS:
+            return
+        if kind == "cancelled" and order["status"] == "pending":
+            # Leaving the flow does not withdraw an order already sent for review
+            return
+
+        order.update(fields)
+        order["status"] = ORDER_STATUS[kind]
+        if kind == "email_received":
+            order["submitted_at"] = event["ts"]
+        elif kind in ("approved", "rejected"):
+            order["decided_at"] = event["ts"]
+            if kind == "approved":
+                self.revenue += order.get("amount", 0)
+                if "expires_at" in fields:
+                    self.subscriptions[key] = {
+                        "user_id": user_id,
+                        "plan_id": order.get("plan_id", ""),
+                        "plan_name": order.get("plan_name", ""),
+                        "expires_at": fields["expires_at"],
+                        "lang": order.get("lang", "en"),
+                        "bot_id": key[0],
+                        "reminded": False,
+                    }
+
+    def pending_orders(self) -> List[Dict[str, Any]]:
+        return [order for order in self.orders.values() if order["status"] == "pending"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "seq": self.seq,
+            "orders": [dict(order) for order in self.orders.values()],
+            "subscriptions": [dict(sub) for sub in self.subscriptions.values()],
+            "counts": dict(self.counts),
+            "revenue": self.revenue,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], default_bot_id: int = 0) -> "OrderProjection":
+        projection = cls(default_bot_id)
+        projection.seq = data["seq"]
+        projection.orders = {projection._key(order): order for order in data["orders"]}
+        projection.subscriptions = {projection._key(sub): sub for sub in data.get("subscriptions", [])}
+        for key, record in (*projection.orders.items(), *projection.subscriptions.items()):
+            record["bot_id"] = key[0]
+        projection.counts = Counter(data["counts"])
+        projection.revenue = data["revenue"]
+        return projection
+
+
+class EventJournal:
+    """
+    Append-only journal of payment events stored in segment files.
+
+    Events are buffered in memory by `record()` and written by a background
+    task that fsyncs once per batch, so handlers never wait on the disk.
+    Every `snapshot_every` events the projection is written to a snapshot
+    file; a restart loads the newest snapshot and replays only the tail.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 4 * 1024 * 1024,
+        flush_interval: float = 1.0,
+        snapshot_every: int = 5000
+    ):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+
+        self.projection = OrderProjection()
+        self._seq = 0
+        self._pending: List[str] = []
+        self._file = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # One flush at a time: the flusher and explicit flush() calls write to the same segment
+        self._flush_lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._last_snapshot_seq = 0
+
+    def _segments(self) -> List[str]:
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith(SEGMENT_PREFIX))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _latest_snapshot(self) -> Optional[str]:
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith(SNAPSHOT_PREFIX))
+        return os.path.join(self.directory, names[-1]) if names else None
+
+    @staticmethod
+    def _first_seq(segment_path: str) -> int:
+        name = os.path.basename(segment_path)
+        return int(name[len(SEGMENT_PREFIX):].split(".")[0])
+
+    def replay(self, from_seq: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Stream journal events in order, one segment at a time.
+
+        Args:
+            from_seq: Only yield events with a sequence number above this
+
+        Yields:
+            dict: Each event as written by `record()`
+        """
+        segments = self._segments()
+        for index, path in enumerate(segments):
+            # Skip segments that end before the requested position
+            if index + 1 < len(segments) and self._first_seq(segments[index + 1]) <= from_seq + 1:
+                continue
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        event = json_loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-write
+                        logger.warning("Skipping corrupt journal line in %s", path)
+                        continue
+                    if event["seq"] > from_seq:
+                        yield event
+
+    def rebuild(self, default_bot_id: int = 0) -> OrderProjection:
+        """
+        Rebuild the projection from the newest snapshot plus the events after it.
+
+        Args:
+            default_bot_id: Bot that records written without a bot ID belong to
+        """
+        snapshot = self._latest_snapshot()
+        if snapshot:
+            with open(snapshot, encoding="utf-8") as file:
+                projection = OrderProjection.from_dict(json_loads(file.read()), default_bot_id)
+        else:
+            projection = OrderProjection(default_bot_id)
+
+        for event in self.replay(projection.seq):
+            projection.apply(event)
+        return projection
+
+    async def start(self, default_bot_id: int = 0) -> None:
+        """Open the journal, rebuild state from disk and start the flusher."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.projection = await asyncio.to_thread(self.rebuild, default_bot_id)
+        self._seq = self.projection.seq
+        self._last_snapshot_seq = self._seq
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info("Journal opened at seq %d (%d orders)", self._seq, len(self.projection.orders))
+
+    def record(self, event_type: str, user_id: Optional[int] = None, **fields: Any) -> None:
+        """
+        Append an event to the journal.
+
+        The event is applied to the in-memory projection immediately and
+        written to disk with the next batch.
+
+        Args:
+            event_type: Event name, e.g. "plan_selected" or "approved"
+            user_id: User the event belongs to
+            **fields: JSON-serializable event details
+        """
+        self._seq += 1
+        event = {"seq": self._seq, "ts": datetime.now().isoformat(), "type": event_type, "user_id": user_id, **fields}
+        self.projection.apply(event)
+        self._pending.append(json_dumps(event) + "\n")
+
+    def _write_batch(self, lines: List[str], first_seq: int) -> None:
+        if self._file is None or self._file.tell() >= self.segment_max_bytes:
+            if self._file is not None:
+                self._file.close()
+            path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:012d}.jsonl")
+            self._file = open(path, "a", encoding="utf-8")
+        self._file.writelines(lines)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_snapshot(self, data: Dict[str, Any]) -> None:
+        path = os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{data['seq']:012d}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(json_dumps(data))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+
+    async def flush(self) -> None:
+        """
+        Write and fsync all buffered events, taking a snapshot when due.
+
+        Concurrent calls run one after the other, so batches reach the
+        disk in sequence order and never race a segment rotation.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            lines, self._pending = self._pending, []
+            first_seq = self._seq - len(lines) + 1
+            try:
+                await asyncio.to_thread(self._write_batch, lines, first_seq)
+            except Exception:
+                # Keep the batch so the next flush retries it
+                self._pending = lines + self._pending
+                raise
+
+            if self._seq - self._last_snapshot_seq >= self.snapshot_every:
+                self._last_snapshot_seq = self._seq
+                await asyncio.to_thread(self._write_snapshot, self.projection.to_dict())
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Journal flush failed: %s", e, exc_info=True)
+
+    async def close(self) -> None:
+        """Stop the flusher and write everything still buffered."""
+        self._stopping.set()
+        if self._flush_task is not None:
+            # The loop performs a final flush before exiting
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def __getattr__(name: str) -> Any:
+    # The bot's journal is created on first use rather than on import, so
+    # tools that only need EventJournal do not load config and its credentials
+    if name == "journal":
+        from config import JOURNAL_DIR
+        globals()["journal"] = EventJournal(JOURNAL_DIR)
+        return globals()["journal"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
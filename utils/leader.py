@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import INSTANCE_ID, LEADER_DB, LEADER_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "singleton-jobs"
+
+
+class LeaderElector:
+    """
+    Lease-based leader election over a SQLite file shared by all instances.
+
+    The leader holds a lease row and renews it every third of the lease
+    period. Another instance takes over once the lease has expired, so a
+    crashed leader is replaced within `lease_seconds`; a leader shutting
+    down cleanly releases the lease for an immediate handover.
+
+    Singleton jobs registered with `add_job` run only while this instance
+    leads and are cancelled as soon as it stops leading.
+    """
+
+    def __init__(self, path: str, instance_id: str, lease_seconds: float = 15.0):
+        self.path = path
+        self.instance_id = instance_id
+        self.lease_seconds = lease_seconds
+        self.is_leader = False
+        self.holder: Optional[str] = None
+        self.changes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._jobs: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._resigning = asyncio.Event()
+        self._campaign: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Used from worker threads, one call at a time
+            self._db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        return self._db
+
+    def _try_acquire(self) -> Optional[str]:
+        """Take or renew the lease if it is ours or expired; returns the current holder."""
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT INTO lease (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE lease.holder = excluded.holder OR lease.expires_at < ?",
+                (LEASE_NAME, self.instance_id, now + self.lease_seconds, now)
+            )
+            row = db.execute("SELECT holder FROM lease WHERE name = ?", (LEASE_NAME,)).fetchone()
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return row[0] if row else None
+
+    def _release(self) -> None:
+        db = self._connect()
+        db.execute("DELETE FROM lease WHERE name = ? AND holder = ?", (LEASE_NAME, self.instance_id))
+        db.close()
+        self._db = None
+
+    def add_job(self, name: str, job: Callable[[], Awaitable[Any]]) -> None:
+        """Register a job (a coroutine factory) that must run on one instance only."""
+        self._jobs[name] = job
+        if self.is_leader:
+            self._tasks[name] = asyncio.create_task(job())
+
+    async def elect(self) -> bool:
+        """
+        Try once to take or keep the lease.
+
+        Returns:
+            bool: Whether this instance is the leader
+        """
+        try:
+            self.holder = await asyncio.to_thread(self._try_acquire)
+            leading = self.holder == self.instance_id
+        except sqlite3.Error as e:
+            # Without a confirmed lease another instance may take over, so step down
+            logger.error("Leader election failed: %s", e)
+            leading = False
+        # An election that finishes after resign() must not restart the jobs
+        leading = leading and not self._resigning.is_set()
+        self._set_leader(leading)
+        return leading
+
+    def _set_leader(self, leading: bool) -> None:
+        if leading == self.is_leader:
+            return
+        self.is_leader = leading
+        self.changes += 1
+        if leading:
+            logger.info("Became leader (%s), starting %d singleton jobs", self.instance_id, len(self._jobs))
+            for name, job in self._jobs.items():
+                self._tasks[name] = asyncio.create_task(job())
+        else:
+            logger.warning("No longer leader (%s), stopping singleton jobs", self.holder)
+            for task in self._tasks.values():
+                task.cancel()
+            self._tasks.clear()
+
+    async def campaign(self) -> None:
+        """Keep electing until `resign()` is called or the task is cancelled."""
+        self._campaign = asyncio.current_task()
+        while not self._resigning.is_set():
+            await self.elect()
+            try:
+                await asyncio.wait_for(self._resigning.wait(), self.lease_seconds / 3)
+            except asyncio.TimeoutError:
+                pass
+
+    async def resign(self) -> None:
+        """
+        Stop campaigning, stop singleton jobs and hand the lease over right away.
+
+        Waits for the campaign to finish any election in progress first, so
+        the lease cannot be taken back after it is released.
+        """
+        self._resigning.set()
+        if self._campaign is not None and self._campaign is not asyncio.current_task():
+            await asyncio.gather(self._campaign, return_exceptions=True)
+        self._set_leader(False)
+        try:
+            # Only deletes the lease if this instance holds it
+            await asyncio.to_thread(self._release)
+        except sqlite3.Error as e:
+            logger.warning("Could not release leadership: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "instance": self.instance_id,
+            "leader": self.is_leader,
+            "holder": self.holder,
+            "changes": self.changes,
+            "jobs": sorted(self._tasks),
+        }
+
+
+leader = LeaderElector(LEADER_DB, INSTANCE_ID or f"{socket.gethostname()}-{os.getpid()}", LEADER_LEASE_SECONDS)
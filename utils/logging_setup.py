@@ -0,0 +1,112 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Request context attached to every record logged while a handler runs
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+current_handler: ContextVar[Optional[str]] = ContextVar("current_handler", default=None)
+
+CONTEXT_FIELDS = ("user_id", "handler", "latency_ms")
+
+
+class ContextFilter(logging.Filter):
+    """Copy the current user and handler onto each record (runs in the calling thread)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "user_id"):
+            record.user_id = current_user_id.get()
+        if not hasattr(record, "handler"):
+            record.handler = current_handler.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of INFO and lower records.
+
+    Warnings and errors always pass, so sampling never hides a problem.
+    Records logged with extra={"unsampled": True} are always kept too.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0 or getattr(record, "unsampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves all formatting to the listener thread.
+
+    The stock handler formats the message and traceback before enqueueing,
+    which is exactly the work we want off the event loop. Records only
+    cross a thread boundary (no pickling), so they are enqueued as-is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", info_sample_rate: float = 1.0) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Handlers only pay for creating the record and putting it on the queue;
+    formatting and writing to stdout happen in the listener thread.
+
+    Args:
+        level: Root log level name
+        fmt: "json" for structured output, anything else for plain text
+        info_sample_rate: Fraction of INFO records to keep (0.0 - 1.0)
+
+    Returns:
+        QueueListener: Started listener; call stop() on shutdown to flush it
+    """
+    output = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(info_sample_rate))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils.logging_setup import current_handler, current_user_id
+
+
+class UpdateLoggingMiddleware(BaseMiddleware):
+    """
+    Tag log records with the user and handler, and log handler latency.
+
+    Also measures its own cost so the overhead of logging per update
+    stays visible; a summary is logged every `report_every` updates.
+    """
+
+    def __init__(self, report_every: int = 1000):
+        self.report_every = report_every
+        self.updates = 0
+        self.overhead_ns = 0
+        self._logger = logging.getLogger("bot.updates")
+
+    @property
+    def overhead_us(self) -> float:
+        """Average logging overhead per update in microseconds."""
+        return self.overhead_ns / self.updates / 1000 if self.updates else 0.0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        overhead_start = time.perf_counter_ns()
+        user = data.get("event_from_user")
+        handler_object = data.get("handler")
+        handler_name = getattr(getattr(handler_object, "callback", None), "__name__", None)
+        user_token = current_user_id.set(user.id if user else None)
+        handler_token = current_handler.set(handler_name)
+        overhead = time.perf_counter_ns() - overhead_start
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            latency_ms = round((time.perf_counter() - start) * 1000, 2)
+
+            overhead_start = time.perf_counter_ns()
+            self._logger.info("Handled update", extra={"latency_ms": latency_ms})
+            current_user_id.reset(user_token)
+            current_handler.reset(handler_token)
+            self.updates += 1
+            self.overhead_ns += overhead + time.perf_counter_ns() - overhead_start
+
+            if self.updates % self.report_every == 0:
+                self._logger.info(
+                    "Logging overhead: %.1f µs/update over %d updates",
+                    self.overhead_us, self.updates,
+                    extra={"unsampled": True}
+                )
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """
+    Track updates that are currently being handled.
+
+    Registered as an outer middleware on `dp.update`, so every update
+    task is known until its handler returns and can be drained on shutdown.
+    """
+
+    def __init__(self):
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            self.tasks.discard(task)
+
+    async def drain(self, timeout: float) -> Tuple[int, int]:
+        """
+        Wait for in-flight updates to finish.
+
+        Args:
+            timeout: Seconds to wait before giving up on the rest
+
+        Returns:
+            Tuple of (updates finished, updates still running)
+        """
+        pending = set(self.tasks)
+        if not pending:
+            return 0, 0
+        done, not_done = await asyncio.wait(pending, timeout=timeout)
+        return len(done), len(not_done)
+
+
+class DeduplicationMiddleware(BaseMiddleware):
+    """
+    Drop updates that were already processed.
+
+    Remembers the last `max_size` update IDs and callback query IDs, so
+    Telegram redeliveries are discarded in O(1) before any handler runs.
+    IDs are only unique per bot, so they are remembered per bot.
+    Registered as an outer middleware on `dp.update`.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self.dropped = 0
+
+    def _check_and_add(self, key: str) -> bool:
+        """Return True if the key was seen before, remembering it otherwise."""
+        if key in self._seen:
+            return True
+        self._seen[key] = None
+        if len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        return False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Update):
+            bot_id = data["bot"].id
+            duplicate = self._check_and_add(f"u:{bot_id}:{event.update_id}")
+            if event.callback_query is not None:
+                duplicate = self._check_and_add(f"c:{bot_id}:{event.callback_query.id}") or duplicate
+            if duplicate:
+                self.dropped += 1
+                return None
+        return await handler(event, data)
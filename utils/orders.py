@@ -0,0 +1,170 @@
+import secrets
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Crockford base32 - no I, L, O or U so references survive being retyped
+REFERENCE_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+REFERENCE_PREFIX = "FB"
+REFERENCE_LENGTH = 6
+
+
+@dataclass
+class Order:
+    """A premium order submitted by a user and waiting for a decision."""
+    user_id: int
+    plan_name: str
+    amount: int
+    created_at: datetime
+    submitted_at: datetime
+    plan_id: str = ""
+    duration_days: int = 30
+    email: str = ""
+    screenshot_file_id: Optional[str] = None
+    lang: str = "en"
+    bot_id: int = 0
+    reference: str = ""
+    status: str = "pending"
+    admin_message_id: Optional[int] = None
+    admin_caption: str = ""
+
+
+@dataclass
+class OrderRegistry:
+    """
+    In-memory registry of open orders, one per user and bot.
+
+    Orders are indexed both by (bot ID, user ID) and by payment reference,
+    so verification never has to search through the open orders. A user
+    buying from two storefront bots has an open order with each.
+
+    Pending orders are also kept in a list sorted by submission time,
+    updated whenever an order enters or leaves "pending", so the review
+    queue pages through it without a scan or a sort.
+    """
+    _orders: Dict[Tuple[int, int], Order] = field(default_factory=dict)
+    _by_reference: Dict[str, Order] = field(default_factory=dict)
+    _pending: List[Tuple[datetime, int, int]] = field(default_factory=list)
+
+    @staticmethod
+    def _pending_key(order: Order) -> Tuple[datetime, int, int]:
+        return order.submitted_at, order.bot_id, order.user_id
+
+    def _index_pending(self, order: Order) -> None:
+        insort(self._pending, self._pending_key(order))
+
+    def _unindex_pending(self, order: Order) -> None:
+        key = self._pending_key(order)
+        index = bisect_left(self._pending, key)
+        if index < len(self._pending) and self._pending[index] == key:
+            del self._pending[index]
+
+    def add(self, order: Order) -> None:
+        """Register an order, replacing any previous open order of the same user with the same bot."""
+        self.remove(order.bot_id, order.user_id)
+        self._orders[order.bot_id, order.user_id] = order
+        if order.reference:
+            self._by_reference[order.reference] = order
+        if order.status == "pending":
+            self._index_pending(order)
+
+    def get(self, bot_id: int, user_id: int) -> Optional[Order]:
+        return self._orders.get((bot_id, user_id))
+
+    def find(self, reference: str) -> Optional[Order]:
+        """Look up an open order by its payment reference."""
+        return self._by_reference.get(reference.strip().upper())
+
+    def remove(self, bot_id: int, user_id: int) -> Optional[Order]:
+        """Drop the user's open order with a bot from every index and return it."""
+        order = self._orders.pop((bot_id, user_id), None)
+        if order is None:
+            return None
+        if order.reference:
+            self._by_reference.pop(order.reference, None)
+        if order.status == "pending":
+            self._unindex_pending(order)
+        return order
+
+    def transition(self, bot_id: int, user_id: int, expected: str, new: str) -> Optional[Order]:
+        """
+        Compare-and-swap the status of a user's order.
+
+        Contains no await, so on the event loop no other handler can run
+        between the check and the update.
+
+        Args:
+            bot_id: Bot the order was placed with
+            user_id: Owner of the order
+            expected: Status the order must currently have
+            new: Status to set
+
+        Returns:
+            Order: The updated order, or None if it was missing or not in `expected`
+        """
+        order = self._orders.get((bot_id, user_id))
+        if order is None or order.status != expected:
+            return None
+        if expected == "pending":
+            self._unindex_pending(order)
+        order.status = new
+        if new == "pending":
+            self._index_pending(order)
+        return order
+
+    def new_reference(self) -> str:
+        """
+        Generate a compact payment reference not used by any open order.
+
+        Returns:
+            str: Reference such as "FB7K2M9Q"
+        """
+        while True:
+            reference = REFERENCE_PREFIX + "".join(
+                secrets.choice(REFERENCE_ALPHABET) for _ in range(REFERENCE_LENGTH)
+            )
+            if reference not in self._by_reference:
+                return reference
+
+    def restore(self, records: List[dict]) -> None:
+        """Re-register pending orders rebuilt from the event journal after a restart."""
+        for record in records:
+            self.add(Order(
+                user_id=record["user_id"],
+                plan_name=record.get("plan_name", "Unknown"),
+                amount=record.get("amount", 0),
+                created_at=datetime.fromisoformat(record["created_at"]),
+                submitted_at=datetime.fromisoformat(record["submitted_at"]),
+                plan_id=record.get("plan_id", ""),
+                duration_days=record.get("duration_days", 30),
+                email=record.get("email", ""),
+                screenshot_file_id=record.get("screenshot_file_id"),
+                lang=record.get("lang", "en"),
+                bot_id=record.get("bot_id", 0),
+                reference=record.get("reference", ""),
+                admin_message_id=record.get("admin_message_id"),
+                admin_caption=record.get("admin_caption", "")
+            ))
+
+    def pending(self) -> List[Order]:
+        """Snapshot of orders still waiting for a decision, oldest submission first."""
+        return [self._orders[key[1:]] for key in self._pending]
+
+    def pending_page(self, offset: int, limit: int) -> Tuple[int, List[Order]]:
+        """
+        One page of pending orders, oldest submission first.
+
+        A slice of the sorted pending index, so orders restored from the
+        journal page in submission order too.
+
+        Returns:
+            tuple: Total number of pending orders and the orders on the page
+        """
+        return len(self._pending), [self._orders[key[1:]] for key in self._pending[offset:offset + limit]]
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+
+orders = OrderRegistry()
@@ -0,0 +1,336 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from aiogram import Bot, methods
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import GetUpdates, Response, TelegramMethod
+from pydantic import ValidationError
+
+from config import BREAKER_FAILURES, BREAKER_RESET_SECONDS, OUTBOX_FILE
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Failures that say the API is unreachable, as opposed to a bad request
+OUTAGE_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)
+
+
+class CircuitOpenError(TelegramNetworkError):
+    """Raised instead of calling the Bot API while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` outage errors in a row the circuit opens and
+    calls fail at once. After `reset_timeout` seconds a single probe call
+    is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; moves an expired open circuit to half-open."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def end_probe(self) -> None:
+        """Let the next call probe again; called however the probe call ended."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Bot API reachable again, circuit closed")
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning("Bot API failing (%d errors in a row), circuit opened", self.failures)
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+class CircuitBreakerMiddleware(BaseRequestMiddleware):
+    """
+    Session middleware that routes every Bot API call through a circuit breaker.
+
+    Long polling is left alone: aiogram already backs off on its own, and
+    getUpdates timing out is normal.
+    """
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ) -> Response:
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+        if not self.breaker.allow():
+            raise CircuitOpenError(method=method, message="Circuit open, Bot API call skipped")
+        probe = self.breaker.state == HALF_OPEN
+        try:
+            response = await make_request(bot, method)
+        except OUTAGE_ERRORS:
+            self.breaker.record_failure()
+            raise
+        except TelegramAPIError:
+            # The API answered; the request itself was wrong
+            self.breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled or failed unexpectedly: the probe did not show the API is back
+            if probe:
+                self.breaker.record_failure()
+            raise
+        finally:
+            if probe:
+                self.breaker.end_probe()
+        self.breaker.record_success()
+        return response
+
+
+class Outbox:
+    """
+    Append-only spool of Bot API calls that could not be delivered.
+
+    Each line holds one method call as JSON, with the ID of the bot that
+    has to make it. Delivery progress is kept as a byte offset in a side
+    file, so a restart resumes where replay stopped; once everything is
+    delivered the spool is truncated.
+
+    The files can be shared by several instances: any instance spools,
+    the leader replays. Appending, reading and truncating hold an
+    exclusive lock on a lock file, and what is left to deliver is always
+    read from disk rather than counted in memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offset_path = path + ".offset"
+        self._lock_path = path + ".lock"
+        # Keeps this process's appends in call order; the file lock covers other processes
+        self._lock = asyncio.Lock()
+        self.spooled = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def has_pending(self) -> bool:
+        """Whether any instance left calls to deliver (two small reads, no lock)."""
+        return self._size() > self._load_offset()
+
+    def load(self) -> int:
+        """Count the calls waiting in the spool."""
+        with self._locked():
+            return len(self._read(self._load_offset()))
+
+    def _load_offset(self) -> int:
+        try:
+            with open(self._offset_path) as file:
+                return int(file.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _save_offset(self, offset: int) -> None:
+        # Replaced atomically, so a reader never sees it half written
+        tmp_path = self._offset_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(str(offset))
+        os.replace(tmp_path, self._offset_path)
+
+    def _append(self, line: str) -> None:
+        with self._locked():
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _read(self, offset: int) -> List[tuple]:
+        """Entries after `offset` as (end offset, entry) pairs."""
+        entries = []
+        try:
+            with open(self.path, "rb") as file:
+                file.seek(offset)
+                for line in file:
+                    offset += len(line)
+                    try:
+                        entries.append((offset, json.loads(line)))
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping corrupt outbox line")
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _read_pending(self) -> List[tuple]:
+        with self._locked():
+            return self._read(self._load_offset())
+
+    def _truncate_if_done(self, end: int) -> bool:
+        """Remove the spool if nothing was appended after `end`, by any instance."""
+        with self._locked():
+            if self._size() != end or self._load_offset() != end:
+                return False
+            for path in (self.path, self._offset_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            return True
+
+    async def spool(self, method: TelegramMethod, bot_id: int = 0) -> None:
+        """Store a call for later delivery by the bot `bot_id`."""
+        # Unset fields are left out so bot defaults still apply on replay
+        params = method.model_dump(mode="json", exclude_none=True, exclude_defaults=True)
+        entry = {"method": type(method).__name__, "bot_id": bot_id, "params": params}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        async with self._lock:
+            await asyncio.to_thread(self._append, line)
+            self.spooled += 1
+
+    async def replay(self, get_bot: Callable[[int], Bot], rate: float) -> int:
+        """
+        Deliver spooled calls in order, at most `rate` per second.
+
+        Each call is made by the bot `get_bot` returns for its bot ID.
+        Stops at the first outage error and keeps the rest for the next
+        attempt. Calls the API rejects (blocked user, bad request) and
+        entries that no longer parse are dropped so they cannot hold up
+        the queue. Calls spooled meanwhile,
+        here or on another instance, are picked up by the next replay.
+
+        Returns:
+            int: Number of calls delivered
+        """
+        entries = await asyncio.to_thread(self._read_pending)
+
+        delivered = 0
+        finished = True
+        for end, entry in entries:
+            try:
+                method = getattr(methods, entry["method"]).model_validate(entry["params"])
+            except (ValidationError, AttributeError, KeyError, TypeError) as e:
+                self.dropped += 1
+                logger.error("Dropping unreadable outbox entry %r: %s", entry, e)
+                await asyncio.to_thread(self._save_offset, end)
+                continue
+            try:
+                await get_bot(entry.get("bot_id", 0))(method)
+                delivered += 1
+                self.delivered += 1
+            except TelegramRetryAfter as e:
+                logger.warning("Outbox replay rate limited, pausing %d s", e.retry_after)
+                await asyncio.sleep(e.retry_after)
+                finished = False
+                break
+            except OUTAGE_ERRORS:
+                finished = False
+                break
+            except TelegramAPIError as e:
+                self.dropped += 1
+                logger.warning("Dropping undeliverable %s from the outbox: %s", entry["method"], e)
+
+            await asyncio.to_thread(self._save_offset, end)
+            await asyncio.sleep(1 / rate)
+
+        if finished and entries:
+            # Start over with an empty file unless something was spooled meanwhile
+            await asyncio.to_thread(self._truncate_if_done, entries[-1][0])
+        return delivered
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_bytes": max(self._size() - self._load_offset(), 0),
+            "spooled": self.spooled,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET_SECONDS)
+outbox = Outbox(OUTBOX_FILE)
+
+
+async def deliver(bot: Bot, method: TelegramMethod) -> Optional[Any]:
+    """
+    Send a call that must not be lost, spooling it if the API is unavailable.
+
+    While older calls are still spooled, new ones are queued behind them so
+    every user receives messages in the order they were sent.
+
+    Returns:
+        The API result, or None if the call was spooled
+    """
+    if not outbox.has_pending():
+        try:
+            return await bot(method)
+        except OUTAGE_ERRORS as e:
+            logger.warning("Bot API unavailable, spooling %s: %s", type(method).__name__, e)
+    await outbox.spool(method, bot.id)
+    return None
+
+
+async def run_outbox_replay(get_bot: Callable[[int], Bot], rate: float, interval: float = 5.0) -> None:
+    """Replay the outbox whenever it has entries and the circuit lets calls through."""
+    while True:
+        try:
+            # Checked on disk, as followers spool into the same file. While the
+            # circuit is open the first call fails fast and replay stops there
+            if await asyncio.to_thread(outbox.has_pending):
+                sent = await outbox.replay(get_bot, rate)
+                if sent:
+                    logger.info("Delivered %d spooled messages", sent)
+        except Exception as e:
+            logger.error("Outbox replay failed: %s", e, exc_info=True)
+        await asyncio.sleep(interval)
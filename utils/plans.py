@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config import PLANS_FILE
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Plan:
+    """A purchasable plan as defined in the plan catalog file."""
+    id: str
+    title: str
+    price: int
+    duration_days: int
+    available: bool = True
+    highlight: bool = False
+    names: Dict[str, str] = field(default_factory=dict)
+    description: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def callback_data(self) -> str:
+        # The price is part of the callback, so buttons sent before a
+        # repricing stop working instead of charging the old price
+        return f"plan_{self.id}_{self.price}"
+
+    def name(self, lang: str) -> str:
+        return self.names.get(lang) or self.names.get("en") or self.title
+
+    def description_lines(self, lang: str) -> List[str]:
+        return self.description.get(lang) or self.description.get("en", [])
+
+
+class PlanCatalog:
+    """
+    Plans loaded from a JSON file and compiled into a lookup table.
+
+    The file is re-checked at most every `check_interval` seconds when the
+    catalog is used, so edits go live without a restart. `version` changes
+    on every successful reload, which lets callers key their caches on it.
+    A file that fails to load leaves the previous catalog in place.
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0
+        self._plans: List[Plan] = []
+        self._by_callback: Dict[str, Plan] = {}
+        self._mtime = 0.0
+        self._checked_at = 0.0
+
+    def load(self) -> int:
+        """
+        (Re)load the catalog file.
+
+        Returns:
+            int: Number of plans loaded
+
+        Raises:
+            ValueError: If the file is missing fields, has a price or
+                duration that is not a positive whole number, or defines
+                a plan ID twice
+        """
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding="utf-8") as file:
+            raw = json.load(file)
+
+        try:
+            plans = [Plan(**entry) for entry in raw["plans"]]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid plan catalog: {e}") from e
+
+        for plan in plans:
+            for name in ("price", "duration_days"):
+                value = getattr(plan, name)
+                # bool is an int subclass, so rule it out explicitly
+                if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+                    raise ValueError(f"Invalid plan catalog: {name} of {plan.id} must be a positive whole number")
+        if len({plan.id for plan in plans}) != len(plans):
+            raise ValueError("Invalid plan catalog: duplicate plan id")
+        by_callback = {plan.callback_data: plan for plan in plans}
+
+        self._plans = plans
+        self._by_callback = by_callback
+        self._mtime = mtime
+        self.version += 1
+        return len(plans)
+
+    def refresh(self) -> None:
+        """Reload the file if it changed, checking at most every `check_interval` seconds."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            if os.path.getmtime(self.path) != self._mtime:
+                count = self.load()
+                logger.info("Plan catalog reloaded: %d plans (version %d)", count, self.version)
+        except (OSError, ValueError) as e:
+            logger.error("Could not reload plan catalog, keeping the previous one: %s", e)
+
+    @property
+    def plans(self) -> List[Plan]:
+        self.refresh()
+        return self._plans
+
+    def get(self, callback_data: str) -> Optional[Plan]:
+        """Find the plan behind a plan button's callback data in O(1)."""
+        self.refresh()
+        return self._by_callback.get(callback_data)
+
+
+catalog = PlanCatalog(PLANS_FILE)
@@ -0,0 +1,176 @@
+import asyncio
+import html
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import List, Optional
+
+# Longest profiling window an admin can ask for
+MAX_DURATION = 60
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+APP_DIRS = (os.path.join(ROOT, "handlers") + os.sep, os.path.join(ROOT, "utils") + os.sep)
+
+
+def _label(frame: FrameType) -> str:
+    path = frame.f_code.co_filename
+    if path.startswith(ROOT):
+        path = path[len(ROOT):]
+    else:
+        path = os.path.basename(path)
+    return f"{path}:{frame.f_code.co_name}"
+
+
+def _is_app_frame(frame: FrameType) -> bool:
+    path = frame.f_code.co_filename
+    return path.startswith(APP_DIRS) and path != __file__
+
+
+def _await_chain(coro) -> List[FrameType]:
+    """Frames of a suspended coroutine, from the task's coroutine down to what it awaits."""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+@dataclass
+class ProfileReport:
+    """Samples of one profiling window."""
+    duration: float
+    interval: float
+    task_interval: float
+    samples: int = 0
+    idle: int = 0
+    # On-CPU samples by innermost function, by innermost app function and by full stack
+    leaf: Counter = field(default_factory=Counter)
+    app: Counter = field(default_factory=Counter)
+    stacks: Counter = field(default_factory=Counter)
+    # Suspended-task samples by the app function that is awaiting
+    awaiting: Counter = field(default_factory=Counter)
+
+    @property
+    def busy(self) -> int:
+        return self.samples - self.idle
+
+    def collapsed(self) -> str:
+        """On-CPU stacks in collapsed format, ready for flamegraph tools."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class SamplingProfiler:
+    """
+    Low-overhead sampling profiler for the running bot.
+
+    A worker thread looks at the event loop thread's stack every
+    `interval` seconds. A loop blocked in `select` is idle, waiting for
+    I/O; anything else is on-CPU time and is attributed to the innermost
+    function in `handlers/` or `utils/`. Every `task_every` samples it also
+    walks the suspended asyncio tasks to see which app function each one
+    is awaiting in, e.g. a Telegram API call.
+
+    Nothing runs between profiling windows.
+    """
+
+    def __init__(self, interval: float = 0.005, task_every: int = 10):
+        self.interval = interval
+        self.task_every = task_every
+        self.running = False
+
+    async def profile(self, duration: float) -> ProfileReport:
+        """
+        Sample the event loop for `duration` seconds.
+
+        Raises:
+            RuntimeError: If a profiling window is already running
+        """
+        if self.running:
+            raise RuntimeError("A profile is already running")
+        self.running = True
+        try:
+            loop = asyncio.get_running_loop()
+            return await asyncio.to_thread(self._sample, loop, threading.get_ident(), duration)
+        finally:
+            self.running = False
+
+    def _sample(self, loop: asyncio.AbstractEventLoop, loop_thread: int, duration: float) -> ProfileReport:
+        report = ProfileReport(duration, self.interval, self.interval * self.task_every)
+        deadline = time.perf_counter() + duration
+        tick = 0
+
+        while time.perf_counter() < deadline:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(loop_thread)
+            if frame is None:
+                break
+            report.samples += 1
+            self._sample_stack(report, frame)
+
+            tick += 1
+            if tick % self.task_every == 0:
+                self._sample_tasks(report, loop)
+
+        return report
+
+    @staticmethod
+    def _sample_stack(report: ProfileReport, frame: FrameType) -> None:
+        stack = []
+        app_frame: Optional[FrameType] = None
+        while frame is not None:
+            stack.append(frame)
+            if app_frame is None and _is_app_frame(frame):
+                app_frame = frame
+            frame = frame.f_back
+
+        leaf = stack[0]
+        if leaf.f_code.co_name == "select" and leaf.f_code.co_filename.endswith("selectors.py"):
+            report.idle += 1
+            return
+
+        report.leaf[_label(leaf)] += 1
+        report.app[_label(app_frame) if app_frame is not None else "(outside app code)"] += 1
+        report.stacks[";".join(_label(f) for f in reversed(stack))] += 1
+
+    @staticmethod
+    def _sample_tasks(report: ProfileReport, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            tasks = list(asyncio.all_tasks(loop))
+        except RuntimeError:
+            return  # The task set changed while it was copied; try next time
+        for task in tasks:
+            frames = [f for f in _await_chain(task.get_coro()) if _is_app_frame(f)]
+            if frames:
+                report.awaiting[_label(frames[-1])] += 1
+
+
+def format_profile(report: ProfileReport, top: int = 10) -> str:
+    """Render a profile for the admin chat (HTML)."""
+    samples = max(report.samples, 1)
+    lines = [
+        "⏱ <b>PROFILE</b>\n",
+        f"Window: <b>{report.duration:.0f} s</b>, {report.samples} samples every {report.interval * 1000:.0f} ms",
+        f"🔥 On CPU: <b>{report.busy / samples:.0%}</b> · 💤 Waiting for I/O: <b>{report.idle / samples:.0%}</b>",
+    ]
+
+    def section(title: str, counter: Counter, unit: float) -> None:
+        if not counter:
+            return
+        lines.append(f"\n<b>{title}</b>")
+        for name, count in counter.most_common(top):
+            lines.append(f"• {count * unit:.2f} s <code>{html.escape(name)}</code>")
+
+    section("On CPU, by app function", report.app, report.interval)
+    section("On CPU, by innermost function", report.leaf, report.interval)
+    section("Task time awaiting, by app function", report.awaiting, report.task_interval)
+    return "\n".join(lines)
+
+
+profiler = SamplingProfiler()
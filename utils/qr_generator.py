@@ -1,25 +1,28 @@
 from io import BytesIO
-import qrcode
 
 
-def generate_payment_qr(plan_name: str, amount: int) -> BytesIO:
+def generate_payment_qr(plan_name: str, amount: int, reference: str = "") -> BytesIO:
     """
     Generate a fake/test QR code for payment.
     
     TO REPLACE WITH REAL PAYMENT QR:
     1. Replace the qr_data string with your actual UPI payment string:
-       Example: f"upi://pay?pa=yourUPI@bank&pn=YourName&am={amount}&cu=INR&tn=Premium Plan {plan_name}"
+       Example: f"upi://pay?pa=yourUPI@bank&pn=YourName&am={amount}&cu=INR&tr={reference}&tn={reference} {plan_name}"
     2. Or integrate with your payment gateway API to get dynamic QR data
     3. Keep the rest of the function unchanged
     
     Args:
         plan_name: Name of the plan (e.g., "1 Month", "3 Months")
         amount: Payment amount in rupees
+        reference: Unique order reference, shown in the payer's transaction note
         
     Returns:
         BytesIO: QR code image buffer ready to send via Telegram
     """
-    qr_data = f"TEST_PAYMENT|Plan:{plan_name}|Amount:{amount}"
+    # Imported on first use: qrcode pulls in Pillow, which slows down cold starts
+    import qrcode
+    
+    qr_data = f"TEST_PAYMENT|Plan:{plan_name}|Amount:{amount}|Ref:{reference}"
     
     qr = qrcode.QRCode(
         version=1,
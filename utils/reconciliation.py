@@ -0,0 +1,298 @@
+import csv
+import hashlib
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Container, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from utils.orders import REFERENCE_ALPHABET, REFERENCE_LENGTH, REFERENCE_PREFIX, Order
+
+# Header names used by common UPI apps and bank statement exports
+AMOUNT_COLUMNS = ("amount", "credit", "credit amount", "cr amount", "deposit", "deposit amt", "amount (inr)")
+DATE_COLUMNS = ("date", "time", "txn date", "transaction date", "date & time", "value date", "timestamp")
+REFERENCE_COLUMNS = ("reference", "ref", "ref no", "utr", "remarks", "description", "narration", "note")
+TYPE_COLUMNS = ("type", "cr/dr", "dr/cr", "transaction type")
+
+DATETIME_FORMATS = (
+    "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M",
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%d %b %Y %I:%M %p", "%d %b %Y, %I:%M %p",
+)
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d %b %Y", "%d/%m/%y")
+
+REFERENCE_PATTERN = re.compile(f"{REFERENCE_PREFIX}[{REFERENCE_ALPHABET}]{{{REFERENCE_LENGTH}}}")
+
+# UPI transaction reference (UTR): 12 digits, unique per payment
+UTR_PATTERN = re.compile(r"(?<!\d)\d{12}(?!\d)")
+
+# Payments can be recorded slightly before the QR was shown if clocks drift
+CLOCK_SKEW = timedelta(minutes=2)
+
+
+@dataclass
+class Credit:
+    """A single incoming payment read from a statement."""
+    line: int
+    amount: int
+    time: datetime
+    has_time: bool
+    reference: str
+    # Identifies the payment across imports: its UTR, or a hash of the statement row
+    fingerprint: str = ""
+
+
+@dataclass
+class ReconcileReport:
+    """Outcome of matching a statement against the open orders."""
+    credits: int = 0
+    matched: List[Tuple[Credit, Order]] = field(default_factory=list)
+    ambiguous: List[Tuple[Credit, List[Order]]] = field(default_factory=list)
+    # Credits quoting an order reference that is not pending (or not for this amount)
+    unresolved: List[Credit] = field(default_factory=list)
+    unmatched: int = 0
+    already_used: int = 0
+
+
+def _find_column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    for index, column in enumerate(header):
+        if column.strip().lower() in names:
+            return index
+    return None
+
+
+def _parse_amount(raw: str) -> Optional[int]:
+    cleaned = re.sub(r"[^\d.\-]", "", raw)
+    if not cleaned:
+        return None
+    try:
+        value = float(cleaned)
+    except ValueError:
+        return None
+    # Only whole rupee credits can belong to an order
+    if value <= 0 or value != int(value):
+        return None
+    return int(value)
+
+
+def _parse_time(raw: str) -> Optional[Tuple[datetime, bool]]:
+    raw = raw.strip()
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(raw, fmt), True
+        except ValueError:
+            continue
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(raw, fmt), False
+        except ValueError:
+            continue
+    return None
+
+
+def _fingerprint(row: List[str], reference: str, occurrences: Counter) -> str:
+    utr = UTR_PATTERN.search(reference)
+    if utr:
+        return f"utr:{utr.group()}"
+    digest = hashlib.sha256("\x1f".join(cell.strip() for cell in row).encode()).hexdigest()[:32]
+    # Identical rows (same amount, date and note) are different payments; number them
+    occurrences[digest] += 1
+    return f"row:{digest}:{occurrences[digest]}"
+
+
+def iter_credits(path: str) -> Iterator[Credit]:
+    """
+    Stream credit rows from a CSV statement export.
+
+    The file is read row by row, so statements of any size are processed
+    in constant memory. Debit rows and rows that cannot be parsed are skipped.
+
+    Args:
+        path: Path to the CSV statement file
+
+    Yields:
+        Credit: Each incoming payment in file order
+    """
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        amount_col = _find_column(header, AMOUNT_COLUMNS)
+        date_col = _find_column(header, DATE_COLUMNS)
+        if amount_col is None or date_col is None:
+            raise ValueError("Statement must have an amount and a date column")
+        reference_col = _find_column(header, REFERENCE_COLUMNS)
+        type_col = _find_column(header, TYPE_COLUMNS)
+        occurrences: Counter = Counter()
+
+        for line, row in enumerate(reader, start=2):
+            if len(row) <= max(amount_col, date_col):
+                continue
+            if type_col is not None and type_col < len(row):
+                if row[type_col].strip().lower() not in ("cr", "credit", "c"):
+                    continue
+
+            amount = _parse_amount(row[amount_col])
+            parsed = _parse_time(row[date_col])
+            if amount is None or parsed is None:
+                continue
+
+            reference = ""
+            if reference_col is not None and reference_col < len(row):
+                reference = row[reference_col].strip()
+
+            yield Credit(
+                line=line,
+                amount=amount,
+                time=parsed[0],
+                has_time=parsed[1],
+                reference=reference,
+                fingerprint=_fingerprint(row, reference, occurrences)
+            )
+
+
+class CreditLedger:
+    """
+    Fingerprints of credits already used to approve an order, kept in a file.
+
+    Re-importing a statement, or an overlapping one, must not approve a
+    second order with the same payment. The file is append-only, one
+    fingerprint per line, and read once on first use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._used: Optional[Set[str]] = None
+
+    def _load(self) -> Set[str]:
+        if self._used is None:
+            try:
+                with open(self.path, encoding="utf-8") as file:
+                    self._used = {line.strip() for line in file if line.strip()}
+            except FileNotFoundError:
+                self._used = set()
+        return self._used
+
+    def __contains__(self, fingerprint: object) -> bool:
+        return fingerprint in self._load()
+
+    def add(self, fingerprint: str) -> None:
+        """Record a credit as used, durably, before its order is approved."""
+        used = self._load()
+        if fingerprint in used:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(fingerprint + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        used.add(fingerprint)
+
+
+class StatementMatcher:
+    """
+    Match statement credits to open orders by amount, time window and reference.
+
+    The candidate index is built once from a snapshot of pending orders,
+    so memory stays proportional to the number of open orders.
+    """
+
+    def __init__(self, pending: Iterable[Order], window: timedelta):
+        self.window = window
+        self._by_amount: Dict[int, List[Order]] = {}
+        self._by_reference: Dict[str, Order] = {}
+        for order in pending:
+            self._by_amount.setdefault(order.amount, []).append(order)
+            if order.reference:
+                self._by_reference[order.reference] = order
+
+    def _in_window(self, order: Order, credit: Credit) -> bool:
+        if not credit.has_time:
+            return order.created_at.date() <= credit.time.date() <= (order.submitted_at + self.window).date()
+        return order.created_at - CLOCK_SKEW <= credit.time <= order.submitted_at + self.window
+
+    @staticmethod
+    def quoted_references(credit: Credit) -> List[str]:
+        return REFERENCE_PATTERN.findall(credit.reference.upper())
+
+    def _claim(self, order: Order) -> Order:
+        self._by_amount[order.amount].remove(order)
+        self._by_reference.pop(order.reference, None)
+        return order
+
+    def match(self, credit: Credit) -> Tuple[Optional[Order], List[Order]]:
+        """
+        Find the order a credit pays for.
+
+        A credit quoting an order reference only ever matches that order.
+        If the reference is not pending or the amount differs, there is no
+        match and the credit needs a human: falling back to the amount
+        could approve someone else's order with it. Matching on amount
+        alone is for credits without any reference.
+
+        Returns:
+            Tuple of (confident match or None, ambiguous candidates)
+        """
+        # A reference quoted in the payment note identifies the order directly
+        references = self.quoted_references(credit)
+        if references:
+            for reference in references:
+                order = self._by_reference.get(reference)
+                if order is not None and order.amount == credit.amount:
+                    return self._claim(order), []
+            return None, []
+
+        candidates = [o for o in self._by_amount.get(credit.amount, ()) if self._in_window(o, credit)]
+        if not candidates:
+            return None, []
+        if len(candidates) == 1:
+            return self._claim(candidates[0]), []
+        return None, candidates
+
+
+def reconcile_statement(
+    path: str,
+    pending: Iterable[Order],
+    window: timedelta,
+    used: Container[str] = ()
+) -> ReconcileReport:
+    """
+    Match every credit of a statement file against the pending orders.
+
+    Each order and each credit is matched at most once. Credits that fit
+    several orders, or quote a reference that is not pending, are
+    reported for manual review.
+
+    Args:
+        path: Path to the CSV statement file
+        pending: Orders waiting for approval
+        window: How long after submission a credit may still belong to an order
+        used: Fingerprints of credits that already approved an order (see CreditLedger)
+
+    Returns:
+        ReconcileReport: Confident matches, credits to review and counters
+    """
+    matcher = StatementMatcher(pending, window)
+    report = ReconcileReport()
+    seen: Set[str] = set()
+
+    for credit in iter_credits(path):
+        report.credits += 1
+        if credit.fingerprint in used or credit.fingerprint in seen:
+            report.already_used += 1
+            continue
+        seen.add(credit.fingerprint)
+
+        order, candidates = matcher.match(credit)
+        if order is not None:
+            report.matched.append((credit, order))
+        elif candidates:
+            report.ambiguous.append((credit, candidates))
+        elif matcher.quoted_references(credit):
+            report.unresolved.append(credit)
+        else:
+            report.unmatched += 1
+
+    return report
@@ -0,0 +1,391 @@
+import asyncio
+import hashlib
+import hmac
+import io
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from aiohttp import web
+
+from config import REVIEW_TOKEN, REVIEW_PAGE_SIZE, THUMBNAILS_DIR
+from utils.orders import orders
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = "review_session"
+SESSION_MAX_AGE = 12 * 3600
+
+# Bot lookup by bot ID and FSM storage, filled in once the dispatcher is built
+review_context: Dict[str, Any] = {}
+
+
+def _make_thumbnail(data: bytes, size: Tuple[int, int], path: str) -> None:
+    """Resize a screenshot to a JPEG thumbnail and store it atomically (runs in the pool)."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        image.thumbnail(size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        image.save(tmp_path, "JPEG", quality=80, optimize=True)
+    os.replace(tmp_path, path)
+
+
+class ThumbnailStore:
+    """
+    Screenshot thumbnails cached on disk.
+
+    Files are named after the SHA-256 of the original screenshot, so the
+    same image is only ever resized and stored once. Which Telegram file
+    ID has which digest is kept on disk next to the thumbnails, so a
+    restart does not download every screenshot again; the most recently
+    used `max_ids` of these are also held in memory. Resizing runs in a
+    small thread pool, downloads are limited to a few at a time, and
+    concurrent requests for one screenshot share a single download.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        size: Tuple[int, int] = (480, 480),
+        workers: int = 2,
+        downloads: int = 4,
+        max_ids: int = 10000
+    ):
+        self.directory = directory
+        self.size = size
+        self.max_ids = max_ids
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="thumbnails")
+        self._downloads = asyncio.Semaphore(downloads)
+        self._by_file: "OrderedDict[str, str]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.jpg")
+
+    def _id_path(self, file_id: str) -> str:
+        # File IDs may contain characters that are not safe in file names
+        name = hashlib.sha256(file_id.encode()).hexdigest()
+        return os.path.join(self.directory, "ids", name[:2], name)
+
+    def _remember(self, file_id: str, digest: str) -> None:
+        self._by_file[file_id] = digest
+        self._by_file.move_to_end(file_id)
+        if len(self._by_file) > self.max_ids:
+            self._by_file.popitem(last=False)
+
+    def _lookup(self, file_id: str) -> Optional[str]:
+        """Digest of a file's screenshot if its thumbnail exists, from memory or the disk index."""
+        digest = self._by_file.get(file_id)
+        if digest is None:
+            try:
+                with open(self._id_path(file_id), encoding="ascii") as file:
+                    digest = file.read().strip()
+            except OSError:
+                return None
+            if not os.path.exists(self.path(digest)):
+                return None
+        self._remember(file_id, digest)
+        return digest
+
+    def _save_id(self, file_id: str, digest: str) -> None:
+        path = self._id_path(file_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="ascii") as file:
+            file.write(digest)
+        os.replace(tmp_path, path)
+
+    async def get(self, bot, file_id: str) -> str:
+        """
+        Path of the thumbnail for a Telegram file, creating it if needed.
+
+        Returns:
+            str: Path of the JPEG thumbnail
+        """
+        digest = self._lookup(file_id)
+        if digest is not None:
+            return self.path(digest)
+        task = self._in_flight.get(file_id)
+        if task is None:
+            task = self._in_flight[file_id] = asyncio.create_task(self._fetch(bot, file_id))
+            task.add_done_callback(lambda done: self._forget(file_id, done))
+        # A client going away must not cancel a download others wait for
+        return await asyncio.shield(task)
+
+    def prefetch(self, bot, file_ids: Iterable[str]) -> None:
+        """Start creating thumbnails in the background, e.g. for the next page."""
+        for file_id in file_ids:
+            if file_id not in self._in_flight and self._lookup(file_id) is None:
+                task = self._in_flight[file_id] = asyncio.create_task(self._fetch(bot, file_id))
+                task.add_done_callback(lambda done, file_id=file_id: self._forget(file_id, done))
+
+    def _forget(self, file_id: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(file_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Could not create thumbnail for %s: %s", file_id, task.exception())
+
+    async def _fetch(self, bot, file_id: str) -> str:
+        async with self._downloads:
+            data = (await bot.download(file_id)).getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        loop = asyncio.get_running_loop()
+        if not os.path.exists(path):
+            await loop.run_in_executor(self._pool, _make_thumbnail, data, self.size, path)
+        await loop.run_in_executor(self._pool, self._save_id, file_id, digest)
+        self._remember(file_id, digest)
+        return path
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+thumbnails = ThumbnailStore(THUMBNAILS_DIR)
+
+
+def _session_value() -> str:
+    return hmac.new(REVIEW_TOKEN.encode(), b"review-session", hashlib.sha256).hexdigest()
+
+
+@web.middleware
+async def require_session(request: web.Request, handler):
+    """Only the login page is reachable without a valid session cookie."""
+    if request.path.endswith("/login"):
+        return await handler(request)
+    if not hmac.compare_digest(request.cookies.get(SESSION_COOKIE, ""), _session_value()):
+        if "/api/" in request.path or "/thumbs/" in request.path:
+            raise web.HTTPUnauthorized()
+        raise web.HTTPFound(request.app.router["login"].url_for())
+    if request.method == "POST" and request.headers.get("X-Requested-With") != "review":
+        # Cross-site forms cannot set custom headers
+        raise web.HTTPForbidden()
+    return await handler(request)
+
+
+async def login_page(request: web.Request) -> web.Response:
+    error = ""
+    if request.method == "POST":
+        form = await request.post()
+        if hmac.compare_digest(str(form.get("token", "")), REVIEW_TOKEN):
+            response = web.HTTPFound(request.app.router["queue"].url_for())
+            response.set_cookie(
+                SESSION_COOKIE, _session_value(), max_age=SESSION_MAX_AGE,
+                httponly=True, samesite="Strict", path="/review"
+            )
+            raise response
+        error = "<p class='error'>Wrong token</p>"
+    return web.Response(text=LOGIN_HTML.replace("{error}", error), content_type="text/html")
+
+
+async def queue_page(request: web.Request) -> web.Response:
+    return web.Response(text=QUEUE_HTML, content_type="text/html")
+
+
+def _order_json(order) -> Dict[str, Any]:
+    return {
+        "user_id": order.user_id,
+        "bot_id": order.bot_id,
+        "reference": order.reference,
+        "plan_name": order.plan_name,
+        "amount": order.amount,
+        "email": order.email,
+        "lang": order.lang,
+        "submitted_at": order.submitted_at.isoformat(timespec="seconds"),
+        "has_screenshot": bool(order.screenshot_file_id),
+    }
+
+
+async def list_orders(request: web.Request) -> web.Response:
+    """One page of pending orders, oldest first; thumbnails of the next page are prepared meanwhile."""
+    try:
+        page = max(int(request.query.get("page", 1)), 1)
+    except ValueError:
+        raise web.HTTPBadRequest()
+    total, page_orders = orders.pending_page((page - 1) * REVIEW_PAGE_SIZE, REVIEW_PAGE_SIZE * 2)
+    current, upcoming = page_orders[:REVIEW_PAGE_SIZE], page_orders[REVIEW_PAGE_SIZE:]
+
+    get_bot = review_context.get("get_bot")
+    if get_bot is not None:
+        # File IDs only work with the bot that received the file
+        for order in current + upcoming:
+            if order.screenshot_file_id:
+                thumbnails.prefetch(get_bot(order.bot_id), [order.screenshot_file_id])
+
+    return web.json_response({
+        "total": total,
+        "page": page,
+        "pages": max((total + REVIEW_PAGE_SIZE - 1) // REVIEW_PAGE_SIZE, 1),
+        "orders": [_order_json(order) for order in current],
+    })
+
+
+async def order_thumbnail(request: web.Request) -> web.StreamResponse:
+    order = orders.get(int(request.match_info["bot_id"]), int(request.match_info["user_id"]))
+    get_bot = review_context.get("get_bot")
+    if order is None or not order.screenshot_file_id or get_bot is None:
+        raise web.HTTPNotFound()
+    try:
+        path = await thumbnails.get(get_bot(order.bot_id), order.screenshot_file_id)
+    except Exception as e:
+        logger.warning("Thumbnail for user %s failed: %s", order.user_id, e)
+        raise web.HTTPBadGateway()
+    return web.FileResponse(path, headers={"Cache-Control": "private, max-age=86400"})
+
+
+async def decide_order(request: web.Request) -> web.Response:
+    """Approve or reject through the same claim-then-apply path as the Telegram buttons."""
+    from handlers.admin import DECISION_STATUS, apply_decision, claim_decision
+
+    action = request.match_info["action"]
+    if action not in DECISION_STATUS:
+        raise web.HTTPNotFound()
+    if "get_bot" not in review_context:
+        raise web.HTTPServiceUnavailable()
+
+    order = claim_decision(int(request.match_info["bot_id"]), int(request.match_info["user_id"]), action)
+    if order is None:
+        return web.json_response({"ok": False, "error": "Already processed"}, status=409)
+    try:
+        bot = review_context["get_bot"](order.bot_id)
+        await apply_decision(bot, review_context["storage"], order, decided_by="Web review")
+    except Exception as e:
+        logger.error("Web review decision failed for user %s: %s", order.user_id, e, exc_info=True)
+        return web.json_response({"ok": False, "error": "Decision recorded, notification failed"}, status=500)
+    return web.json_response({"ok": True, "status": order.status})
+
+
+def create_review_app() -> web.Application:
+    """Review queue, mounted under /review on the health server."""
+    app = web.Application(middlewares=[require_session])
+    app.router.add_route("*", "/login", login_page, name="login")
+    app.router.add_get("/", queue_page, name="queue")
+    app.router.add_get("/api/orders", list_orders)
+    app.router.add_post(r"/api/orders/{bot_id:\d+}/{user_id:\d+}/{action}", decide_order)
+    app.router.add_get(r"/thumbs/{bot_id:\d+}/{user_id:\d+}", order_thumbnail)
+    return app
+
+
+LOGIN_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Review login</title>
+<style>body{font-family:sans-serif;display:flex;justify-content:center;margin-top:15vh}.error{color:#c00}</style>
+</head><body><form method="post">
+<h2>Payment review</h2>{error}
+<input type="password" name="token" placeholder="Review token" autofocus>
+<button type="submit">Sign in</button>
+</form></body></html>
+"""
+
+QUEUE_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Payment review</title>
+<style>
+body{font-family:sans-serif;margin:0;background:#f4f4f4}
+header{position:sticky;top:0;background:#222;color:#fff;padding:8px 16px;display:flex;gap:16px;align-items:center}
+header kbd{background:#444;border-radius:3px;padding:0 4px}
+#orders{display:grid;grid-template-columns:repeat(auto-fill,minmax(260px,1fr));gap:12px;padding:16px}
+.card{background:#fff;border-radius:6px;padding:8px;border:3px solid transparent}
+.card.selected{border-color:#1a73e8}
+.card img{width:100%;height:320px;object-fit:contain;background:#eee;cursor:zoom-in}
+.card .meta{font-size:13px;line-height:1.5;word-break:break-all}
+.card .actions{display:flex;gap:8px;margin-top:6px}
+.card button{flex:1;padding:6px;border:0;border-radius:4px;color:#fff;cursor:pointer}
+.approve{background:#188038}.reject{background:#c5221f}
+#status{margin-left:auto}
+</style></head><body>
+<header><b>Pending payments</b><span id="count"></span>
+<span><kbd>j</kbd>/<kbd>k</kbd> move &nbsp;<kbd>a</kbd> approve &nbsp;<kbd>r</kbd> reject &nbsp;<kbd>o</kbd> open &nbsp;<kbd>n</kbd>/<kbd>p</kbd> page</span>
+<span id="status"></span></header>
+<div id="orders"></div>
+<script>
+let page = 1, pages = 1, selected = 0;
+const list = document.getElementById("orders");
+const status = text => document.getElementById("status").textContent = text;
+
+function card(order) {
+  const el = document.createElement("div");
+  el.className = "card";
+  el.dataset.user = order.user_id;
+  el.dataset.order = order.bot_id + "/" + order.user_id;
+  if (order.has_screenshot) {
+    const img = document.createElement("img");
+    img.loading = "lazy";
+    img.src = "thumbs/" + el.dataset.order;
+    img.onclick = () => window.open(img.src);
+    el.appendChild(img);
+  }
+  const meta = document.createElement("div");
+  meta.className = "meta";
+  for (const line of [
+    order.reference + " · " + order.plan_name + " · ₹" + order.amount,
+    order.email, "User " + order.user_id + " · " + order.submitted_at
+  ]) {
+    const row = document.createElement("div");
+    row.textContent = line;
+    meta.appendChild(row);
+  }
+  el.appendChild(meta);
+  const actions = document.createElement("div");
+  actions.className = "actions";
+  for (const action of ["approve", "reject"]) {
+    const button = document.createElement("button");
+    button.className = action;
+    button.textContent = action === "approve" ? "Approve (a)" : "Reject (r)";
+    button.onclick = () => decide(el, action);
+    actions.appendChild(button);
+  }
+  el.appendChild(actions);
+  el.onclick = e => { if (e.target === el || e.target.parentNode === meta) select([...list.children].indexOf(el)); };
+  return el;
+}
+
+function select(index) {
+  const cards = list.children;
+  if (!cards.length) return;
+  selected = Math.max(0, Math.min(index, cards.length - 1));
+  [...cards].forEach((c, i) => c.classList.toggle("selected", i === selected));
+  cards[selected].scrollIntoView({block: "nearest"});
+}
+
+async function load(target) {
+  const response = await fetch("api/orders?page=" + target);
+  if (response.status === 401) { location.href = "login"; return; }
+  const data = await response.json();
+  page = data.page; pages = data.pages;
+  document.getElementById("count").textContent = data.total + " pending · page " + page + "/" + pages;
+  list.replaceChildren(...data.orders.map(card));
+  select(0);
+}
+
+async function decide(el, action) {
+  status(action + "...");
+  const response = await fetch("api/orders/" + el.dataset.order + "/" + action, {
+    method: "POST", headers: {"X-Requested-With": "review"}
+  });
+  const data = await response.json().catch(() => ({}));
+  status(data.ok ? action + "d " + el.dataset.user : (data.error || "Error " + response.status));
+  if (data.ok || response.status === 409) {
+    const index = [...list.children].indexOf(el);
+    el.remove();
+    if (!list.children.length) load(Math.min(page, Math.max(pages - 1, 1))); else select(index);
+  }
+}
+
+document.addEventListener("keydown", e => {
+  if (e.ctrlKey || e.metaKey || e.altKey) return;
+  const current = list.children[selected];
+  if (e.key === "j" || e.key === "ArrowDown" || e.key === "ArrowRight") select(selected + 1);
+  else if (e.key === "k" || e.key === "ArrowUp" || e.key === "ArrowLeft") select(selected - 1);
+  else if (e.key === "a" && current) decide(current, "approve");
+  else if (e.key === "r" && current) decide(current, "reject");
+  else if (e.key === "o" && current && current.querySelector("img")) window.open(current.querySelector("img").src);
+  else if (e.key === "n" && page < pages) load(page + 1);
+  else if (e.key === "p" && page > 1) load(page - 1);
+});
+
+load(1);
+</script></body></html>
+"""
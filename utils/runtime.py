@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Read here rather than in config, so tools that only read the journal
+# (such as the export CLI) run without the bot's credentials
+load_dotenv()
+# "fast" uses uvloop and orjson when they are installed
+RUNTIME_PROFILE = os.getenv("RUNTIME_PROFILE", "").lower()
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+# JSON codec for the Bot session and the journal. The "fast" profile
+# swaps in orjson when it is installed; both produce plain UTF-8 JSON,
+# so files written under one profile are read fine under the other.
+json_dumps: Callable[[Any], str] = _dumps
+json_loads: Callable[[Any], Any] = json.loads
+JSON_BACKEND = "json"
+
+if RUNTIME_PROFILE == "fast":
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        def json_dumps(obj: Any) -> str:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+        json_loads = orjson.loads
+        JSON_BACKEND = "orjson"
+
+
+def install_event_loop() -> str:
+    """
+    Use uvloop for the event loop under the "fast" profile, if it is installed.
+
+    Must be called before `asyncio.run`.
+
+    Returns:
+        str: Name of the event loop in use
+    """
+    if RUNTIME_PROFILE != "fast":
+        return "asyncio"
+    try:
+        import uvloop
+    except ImportError:
+        return "asyncio"
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+def create_session():
+    """
+    Bot API session using the profile's JSON codec.
+
+    One session can be shared by several bots, which then share its
+    connection pool.
+
+    Returns:
+        AiohttpSession: A new session
+    """
+    from aiogram.client.session.aiohttp import AiohttpSession
+    if JSON_BACKEND == "json":
+        return AiohttpSession()
+    return AiohttpSession(json_loads=json_loads, json_dumps=json_dumps)
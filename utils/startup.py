@@ -0,0 +1,41 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Record how long each startup phase takes.
+
+    Created when the entry point is imported, so the reported total
+    covers the whole cold start up to the moment polling begins.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready_ms: float = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as a named startup phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def mark_ready(self) -> None:
+        """Log the phase timings once the bot is about to take updates."""
+        self.ready_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        summary = ", ".join(f"{name}={ms}ms" for name, ms in self.phases.items())
+        logger.info("Startup ready in %.1f ms (%s)", self.ready_ms, summary)
+
+    def report(self) -> Dict[str, Any]:
+        return {"ready_ms": self.ready_ms, "phases_ms": dict(self.phases)}
+
+
+startup = StartupTimer()
@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.methods import SendMessage
+
+from utils.journal import journal
+from utils.outbox import deliver
+from utils.translations import get_text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Subscription:
+    """An approved purchase and when it runs out."""
+    user_id: int
+    plan_id: str
+    plan_name: str
+    expires_at: datetime
+    lang: str = "en"
+    bot_id: int = 0
+    reminded: bool = False
+
+    @property
+    def active(self) -> bool:
+        return self.expires_at > datetime.now()
+
+
+class SubscriptionStore:
+    """
+    Subscriptions by (bot ID, user ID) with a time-ordered expiry index.
+
+    Each storefront bot sells its own subscriptions, so a user's plan with
+    one bot never extends or shows up on another.
+
+    The index is a min-heap of (expiry, bot ID, user ID). Renewals push a
+    new entry and leave the old one behind; stale entries are recognised
+    and skipped when they reach the top, so no entry is ever searched for.
+    """
+
+    def __init__(self):
+        self._by_user: Dict[Tuple[int, int], Subscription] = {}
+        self._expiry_index: List[Tuple[float, int, int]] = []
+
+    def get(self, bot_id: int, user_id: int) -> Optional[Subscription]:
+        return self._by_user.get((bot_id, user_id))
+
+    def _index(self, subscription: Subscription) -> None:
+        heapq.heappush(
+            self._expiry_index,
+            (subscription.expires_at.timestamp(), subscription.bot_id, subscription.user_id)
+        )
+
+    def activate(
+        self,
+        user_id: int,
+        plan_id: str,
+        plan_name: str,
+        duration_days: int,
+        lang: str,
+        bot_id: int = 0
+    ) -> Subscription:
+        """
+        Start a subscription, or extend the user's one if it is still active.
+
+        Returns:
+            Subscription: The updated record
+        """
+        current = self._by_user.get((bot_id, user_id))
+        start = current.expires_at if current is not None and current.active else datetime.now()
+        subscription = Subscription(
+            user_id=user_id,
+            plan_id=plan_id,
+            plan_name=plan_name,
+            expires_at=start + timedelta(days=duration_days),
+            lang=lang,
+            bot_id=bot_id
+        )
+        self._by_user[bot_id, user_id] = subscription
+        self._index(subscription)
+        return subscription
+
+    def restore(self, records: List[dict]) -> None:
+        """Load subscriptions rebuilt from the event journal after a restart."""
+        for record in records:
+            subscription = Subscription(
+                user_id=record["user_id"],
+                plan_id=record.get("plan_id", ""),
+                plan_name=record.get("plan_name", ""),
+                expires_at=datetime.fromisoformat(record["expires_at"]),
+                lang=record.get("lang", "en"),
+                bot_id=record.get("bot_id", 0),
+                reminded=record.get("reminded", False)
+            )
+            self._by_user[subscription.bot_id, subscription.user_id] = subscription
+            if not subscription.reminded:
+                self._index(subscription)
+
+    def pop_due(self, until: datetime, now: Optional[datetime] = None) -> List[Subscription]:
+        """
+        Take every not-yet-reminded subscription expiring between `now` and `until`.
+
+        Only the due part of the index is touched, never the whole store.
+        Subscriptions that already ended (after downtime, or restored from
+        an old journal) leave the index without a reminder.
+        """
+        due = []
+        limit = until.timestamp()
+        now_ts = (now or datetime.now()).timestamp()
+        while self._expiry_index and self._expiry_index[0][0] <= limit:
+            expires_ts, bot_id, user_id = heapq.heappop(self._expiry_index)
+            subscription = self._by_user.get((bot_id, user_id))
+            if subscription is None or subscription.reminded or subscription.expires_at.timestamp() != expires_ts:
+                continue  # Stale entry left behind by a renewal
+            if expires_ts <= now_ts:
+                continue  # Too late to renew without a break
+            due.append(subscription)
+        return due
+
+    def __len__(self) -> int:
+        return len(self._by_user)
+
+
+subscriptions = SubscriptionStore()
+
+
+async def send_renewal_reminders(
+    get_bot: Callable[[int], Bot],
+    remind_before: timedelta,
+    batch_size: int = 20,
+    batch_pause: float = 1.0
+) -> int:
+    """
+    Remind users whose subscription ends within `remind_before`.
+
+    Messages go out in batches of `batch_size` with `batch_pause` seconds
+    between batches, keeping well below Telegram's broadcast limits. Each
+    user is reminded by the bot they bought through, from `get_bot`.
+
+    Returns:
+        int: Number of reminders sent
+    """
+    now = datetime.now()
+    due = subscriptions.pop_due(now + remind_before, now)
+    sent = 0
+
+    for start in range(0, len(due), batch_size):
+        if start:
+            await asyncio.sleep(batch_pause)
+        for subscription in due[start:start + batch_size]:
+            # Marked before sending, so a blocked user is not retried forever
+            subscription.reminded = True
+            journal.record("renewal_reminded", subscription.user_id, bot_id=subscription.bot_id)
+            try:
+                # Spooled to the outbox if the Bot API is down
+                await deliver(get_bot(subscription.bot_id), SendMessage(
+                    chat_id=subscription.user_id,
+                    text=get_text(
+                        subscription.lang, "renewal_reminder",
+                        subscription.plan_name, subscription.expires_at.strftime('%d %b %Y')
+                    ),
+                    parse_mode="HTML"
+                ))
+                sent += 1
+            except Exception as e:
+                logger.warning("Could not send renewal reminder to user %s: %s", subscription.user_id, e)
+
+    return sent
+
+
+async def run_renewal_sweeper(get_bot: Callable[[int], Bot], interval: float, remind_before: timedelta) -> None:
+    """Send renewal reminders every `interval` seconds until cancelled."""
+    while True:
+        try:
+            sent = await send_renewal_reminders(get_bot, remind_before)
+            if sent:
+                logger.info("Sent %d renewal reminders", sent)
+        except Exception as e:
+            logger.error("Renewal sweep failed: %s", e, exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import TelegramObject
+
+from config import ADMIN_ID, BOT_TOKEN, PLANS_FILE, SUPPORT_BOT
+from utils.orders import orders
+from utils.plans import PlanCatalog, catalog
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A storefront bot served by this process, with its own admins, plans and support contact."""
+    name: str
+    token: str = field(repr=False)
+    admin_ids: Tuple[int, ...]
+    support_bot: str
+    catalog: PlanCatalog = field(compare=False)
+
+    @property
+    def bot_id(self) -> int:
+        # Same as Bot.id: the part of the token before the colon
+        return int(self.token.split(":", 1)[0])
+
+    @property
+    def admin_id(self) -> int:
+        """Chat that receives new orders and decision logs."""
+        return self.admin_ids[0]
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.admin_ids
+
+
+class TenantRegistry:
+    """
+    The storefront bots this process serves, by bot ID.
+
+    The first tenant is configured by BOT_TOKEN, ADMIN_ID, SUPPORT_BOT and
+    PLANS_FILE; more are listed in a tenants file. Tenants with the same
+    plans file share one catalog, and with it the cached plan texts and
+    keyboards. Records written before a bot ID was stored (bot ID 0)
+    belong to the first tenant.
+    """
+
+    def __init__(self):
+        self.primary: Optional[Tenant] = None
+        self.bots: Dict[int, Bot] = {}
+        self.updates: Counter = Counter()
+        self._tenants: Dict[int, Tenant] = {}
+        self._catalogs: Dict[str, PlanCatalog] = {PLANS_FILE: catalog}
+
+    def _catalog(self, path: str) -> PlanCatalog:
+        if path not in self._catalogs:
+            self._catalogs[path] = PlanCatalog(path)
+        return self._catalogs[path]
+
+    def load(self, path: str = "") -> int:
+        """
+        Set up the first tenant and the ones listed in `path`, if any.
+
+        Each entry of the file's "bots" list has a "name", the bot token as
+        "token" or as the name of an environment variable in "token_env",
+        "admin_ids", and optionally "support_bot" and "plans_file".
+
+        Returns:
+            int: Number of tenants
+
+        Raises:
+            ValueError: If an entry is incomplete or a bot is listed twice
+        """
+        tenants = [Tenant("main", BOT_TOKEN, (ADMIN_ID,), SUPPORT_BOT, catalog)]
+        if path:
+            with open(path, encoding="utf-8") as file:
+                raw = json.load(file)
+            try:
+                for entry in raw["bots"]:
+                    token = entry.get("token") or os.getenv(entry.get("token_env", ""), "")
+                    if not token:
+                        raise ValueError(f"no token for {entry['name']}")
+                    tenants.append(Tenant(
+                        name=entry["name"],
+                        token=token,
+                        admin_ids=tuple(int(admin_id) for admin_id in entry["admin_ids"]),
+                        support_bot=entry.get("support_bot", ""),
+                        catalog=self._catalog(entry.get("plans_file", PLANS_FILE))
+                    ))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid tenants file: {e}") from e
+
+        by_id = {tenant.bot_id: tenant for tenant in tenants}
+        if len(by_id) != len(tenants):
+            raise ValueError("Invalid tenants file: the same bot is listed twice")
+
+        self.primary = tenants[0]
+        self._tenants = by_id
+        return len(tenants)
+
+    def catalogs(self) -> List[PlanCatalog]:
+        """Every distinct plan catalog in use."""
+        return list({id(tenant.catalog): tenant.catalog for tenant in self._tenants.values()}.values())
+
+    def admin_ids(self) -> Set[int]:
+        return {admin_id for tenant in self._tenants.values() for admin_id in tenant.admin_ids}
+
+    def create_bots(self, session: BaseSession) -> List[Bot]:
+        """Create a bot per tenant, all sharing `session` and its connection pool."""
+        self.bots = {tenant.bot_id: Bot(token=tenant.token, session=session) for tenant in self._tenants.values()}
+        return list(self.bots.values())
+
+    def get(self, bot_id: int) -> Tenant:
+        return self._tenants.get(bot_id, self.primary)
+
+    def bot(self, bot_id: int) -> Bot:
+        """Bot to reach a user through, from the bot ID stored with their record."""
+        return self.bots.get(bot_id) or self.bots[self.primary.bot_id]
+
+    def stats(self, storage: Any = None) -> Dict[str, Dict[str, int]]:
+        """Per-bot metrics; FSM records are counted when `storage` is a MemoryStorage."""
+        pending = Counter(self.get(order.bot_id).bot_id for order in orders.pending())
+        fsm_records = Counter(key.bot_id for key in getattr(storage, "storage", {}))
+        return {
+            tenant.name: {
+                "bot_id": bot_id,
+                "updates": self.updates[bot_id],
+                "pending_orders": pending[bot_id],
+                "fsm_records": fsm_records[bot_id],
+                "plans_version": tenant.catalog.version,
+            }
+            for bot_id, tenant in self._tenants.items()
+        }
+
+
+tenants = TenantRegistry()
+
+
+class TenantMiddleware(BaseMiddleware):
+    """
+    Pass the tenant of the bot that received an update to handlers as `tenant`.
+
+    Registered as an outer middleware on `dp.update`, so it also counts
+    every update per bot.
+    """
+
+    def __init__(self, registry: TenantRegistry):
+        self.registry = registry
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        bot_id = data["bot"].id
+        self.registry.updates[bot_id] += 1
+        data["tenant"] = self.registry.get(bot_id)
+        return await handler(event, data)
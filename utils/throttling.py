@@ -0,0 +1,166 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+
+from utils.translations import get_text
+
+CHEAP = "cheap"
+EXPENSIVE = "expensive"
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`."""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def consume(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class SlidingWindowCounter:
+    """
+    Approximate count of events in the last `window` seconds.
+
+    Keeps only the current and previous fixed window and weights the
+    previous one by how much of it still overlaps, so memory is constant.
+    """
+    __slots__ = ("window", "start", "current", "previous")
+
+    def __init__(self, window: float, now: float):
+        self.window = window
+        self.start = now
+        self.current = 0
+        self.previous = 0
+
+    def hit(self, now: float) -> float:
+        elapsed = now - self.start
+        if elapsed >= self.window:
+            # Roll over; after two idle windows nothing carries over
+            self.previous = self.current if elapsed < 2 * self.window else 0
+            self.current = 0
+            self.start = now - (elapsed % self.window)
+            elapsed = now - self.start
+        self.current += 1
+        return self.previous * (1 - elapsed / self.window) + self.current
+
+
+class _UserLimits:
+    __slots__ = ("buckets", "window", "warned")
+
+    def __init__(self, window: SlidingWindowCounter):
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.window = window
+        self.warned = False
+
+
+def classify(event: TelegramObject) -> str:
+    """Expensive actions render and upload a QR or carry media; everything else is cheap."""
+    if isinstance(event, CallbackQuery):
+        return EXPENSIVE if (event.data or "").startswith("plan_") else CHEAP
+    if isinstance(event, Message) and (event.photo or event.document):
+        return EXPENSIVE
+    return CHEAP
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Per-user rate limiting for messages and callback queries.
+
+    Registered as an outer middleware on `dp.update` ahead of the
+    executor, so a throttled update never waits for a user lock or
+    executor slot. Updates other than messages and callback queries pass
+    through.
+
+    Each user gets a token bucket per action class. An update that finds
+    its bucket empty gets a short "slow down" reply and is dropped before
+    any filter or handler runs. Users who exceed `abuse_limit` updates per
+    `abuse_window` seconds are shed silently until they calm down.
+
+    State is kept for at most `max_users` users; the least recently seen
+    are evicted first, so memory stays bounded.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, float]],
+        abuse_limit: int = 60,
+        abuse_window: float = 60.0,
+        max_users: int = 10000,
+        exempt: Iterable[int] = ()
+    ):
+        self.limits = limits
+        self.abuse_limit = abuse_limit
+        self.abuse_window = abuse_window
+        self.max_users = max_users
+        self.exempt = set(exempt)
+        self._users: "OrderedDict[int, _UserLimits]" = OrderedDict()
+        self.throttled = 0
+        self.shed = 0
+
+    def _limits_for(self, user_id: int, now: float) -> _UserLimits:
+        limits = self._users.get(user_id)
+        if limits is None:
+            limits = _UserLimits(SlidingWindowCounter(self.abuse_window, now))
+            self._users[user_id] = limits
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return limits
+
+    async def _slow_down(self, event: TelegramObject, data: Dict[str, Any]) -> None:
+        state = data.get("state")
+        lang = (await state.get_data()).get("language", "en") if state else "en"
+        # A toast for callbacks, a short reply for messages
+        await event.answer(get_text(lang, "slow_down"))
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        update, event = event, event.event if isinstance(event, Update) else event
+        user = data.get("event_from_user")
+        if user is None or user.id in self.exempt or not isinstance(event, (Message, CallbackQuery)):
+            return await handler(update, data)
+
+        now = time.monotonic()
+        limits = self._limits_for(user.id, now)
+
+        if limits.window.hit(now) > self.abuse_limit:
+            self.shed += 1
+            # Callbacks must still be answered or the button keeps spinning
+            if isinstance(event, CallbackQuery):
+                await event.answer()
+            return None
+
+        action = classify(event)
+        bucket = limits.buckets.get(action)
+        if bucket is None:
+            rate, capacity = self.limits[action]
+            bucket = limits.buckets[action] = TokenBucket(rate, capacity, now)
+
+        if bucket.consume(now):
+            limits.warned = False
+            return await handler(update, data)
+
+        self.throttled += 1
+        # Text messages get one warning per burst; callbacks always need an answer
+        if isinstance(event, CallbackQuery) or not limits.warned:
+            limits.warned = True
+            await self._slow_down(event, data)
+        return None
@@ -1,11 +1,25 @@
 import asyncio
+import glob
+import json
 import logging
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
 from aiogram import Bot
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
 from handlers import PremiumStates
+from utils.journal import journal
 
 logger = logging.getLogger(__name__)
 
+# Checkout steps after the timer that are saved on shutdown as well
+CHECKOUT_STATES = (PremiumStates.waiting_for_screenshot.state, PremiumStates.waiting_for_email.state)
+
+# Running timers by (bot ID, chat ID): (task, deadline, user's FSM context)
+_timers: Dict[Tuple[int, int], Tuple[asyncio.Task, datetime, FSMContext]] = {}
+
 
 async def start_payment_timer(
     bot: Bot,
@@ -29,10 +43,11 @@ async def start_payment_timer(
         
         current_state = await state.get_state()
         if current_state != PremiumStates.timer_running.state:
-            logger.info(f"Timer cancelled for user {chat_id} (state changed)")
+            logger.info("Timer cancelled for user %s (state changed)", chat_id)
             return
         
         await state.set_state(PremiumStates.waiting_for_screenshot)
+        journal.record("timer_expired", chat_id, bot_id=bot.id)
         
         await bot.send_message(
             chat_id,
@@ -41,9 +56,205 @@ async def start_payment_timer(
             "Please upload your payment screenshot now."
         )
         
-        logger.info(f"Timer completed for user {chat_id}")
+        logger.info("Timer completed for user %s", chat_id)
         
     except asyncio.CancelledError:
-        logger.info(f"Timer cancelled for user {chat_id}")
+        logger.info("Timer cancelled for user %s", chat_id)
     except Exception as e:
-        logger.error(f"Error in timer for user {chat_id}: {e}", exc_info=True)
+        logger.error("Error in timer for user %s: %s", chat_id, e, exc_info=True)
+
+
+def schedule_payment_timer(bot: Bot, chat_id: int, state: FSMContext, duration: int = 300) -> asyncio.Task:
+    """
+    Run `start_payment_timer` as a tracked background task.
+    
+    A user has at most one running timer per bot; scheduling a new one
+    cancels the previous timer of the same chat.
+    
+    Args:
+        bot: Bot instance for sending messages
+        chat_id: User's chat ID
+        state: FSM context to track user state
+        duration: Timer duration in seconds
+        
+    Returns:
+        asyncio.Task: The timer task
+    """
+    key = (bot.id, chat_id)
+    previous = _timers.pop(key, None)
+    if previous is not None:
+        previous[0].cancel()
+    
+    task = asyncio.create_task(start_payment_timer(bot, chat_id, state, duration))
+    _timers[key] = (task, datetime.now() + timedelta(seconds=duration), state)
+    
+    def _forget(done: asyncio.Task):
+        if key in _timers and _timers[key][0] is done:
+            del _timers[key]
+    
+    task.add_done_callback(_forget)
+    return task
+
+
+def running_timers() -> int:
+    return len(_timers)
+
+
+def instance_timers_path(path: str, instance_id: str) -> str:
+    """
+    File an instance saves its timers to, next to TIMERS_FILE.
+
+    Each instance writes its own file, so instances shutting down at the
+    same time do not overwrite each other's timers.
+    """
+    root, ext = os.path.splitext(path)
+    safe_id = re.sub(r"[^\w.-]", "_", instance_id)
+    return f"{root}.{safe_id}{ext}"
+
+
+async def persist_timers(path: str, storage: Optional[BaseStorage] = None) -> int:
+    """
+    Save every running timer with its user's FSM state and stop them.
+    
+    Used on shutdown so a redeploy does not lose users who are in the
+    middle of paying; `restore_timers` picks them up on the next start.
+    Users of `storage` whose timer already ran out and who still have to
+    send the screenshot or email are saved too, without a deadline.
+    
+    Args:
+        path: JSON file to write the timers to
+        storage: FSM storage to take the other checkouts from; only a
+            MemoryStorage is read, others persist state on their own
+        
+    Returns:
+        int: Number of checkouts saved
+    """
+    entries = []
+    saved = set()
+    for (bot_id, chat_id), (task, deadline, state) in list(_timers.items()):
+        if task.done():
+            continue
+        saved.add((bot_id, chat_id))
+        entries.append({
+            "bot_id": bot_id,
+            "chat_id": chat_id,
+            "deadline": deadline.isoformat(),
+            "state": await state.get_state(),
+            "data": await state.get_data()
+        })
+        task.cancel()
+    
+    for key, record in list(getattr(storage, "storage", {}).items()):
+        if (
+            record.state in CHECKOUT_STATES
+            and key.chat_id == key.user_id
+            and (key.bot_id, key.chat_id) not in saved
+        ):
+            entries.append({
+                "bot_id": key.bot_id,
+                "chat_id": key.chat_id,
+                "deadline": None,
+                "state": record.state,
+                "data": dict(record.data)
+            })
+    
+    if entries:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(entries, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    return len(entries)
+
+
+def _claim_timer_files(path: str) -> list:
+    """
+    Take every saved timer file: TIMERS_FILE and the per-instance files.
+
+    A file is renamed before it is read, so it is restored exactly once
+    even if two instances claim at the same time.
+    """
+    root, ext = os.path.splitext(path)
+    claimed = []
+    for candidate in sorted(set(glob.glob(f"{glob.escape(root)}.*{ext}") + [path])):
+        claimed_path = candidate + ".restoring"
+        try:
+            os.rename(candidate, claimed_path)
+        except FileNotFoundError:
+            continue
+        claimed.append(claimed_path)
+    return claimed
+
+
+async def restore_timers(get_bot: Callable[[int], Bot], storage: BaseStorage, path: str) -> int:
+    """
+    Restart timers saved by `persist_timers` and restore their FSM state.
+    
+    Picks up the files of every instance, including ones that have
+    since gone away. Timers whose deadline passed while nobody ran them
+    fire right away; checkouts saved without a deadline only get their
+    state back. A file that cannot be read is moved aside with a
+    ".corrupt" suffix and the other files are still restored.
+    
+    Args:
+        get_bot: Returns the bot a timer was started by, from its bot ID
+        storage: FSM storage to restore user state into
+        path: TIMERS_FILE; per-instance files next to it are included
+        
+    Returns:
+        int: Number of timers restored
+    """
+    restored = 0
+    for claimed_path in await asyncio.to_thread(_claim_timer_files, path):
+        try:
+            with open(claimed_path, encoding="utf-8") as file:
+                entries = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error("Could not read saved timers %s, moving it aside: %s", claimed_path, e)
+            os.replace(claimed_path, claimed_path[:-len(".restoring")] + ".corrupt")
+            continue
+        os.remove(claimed_path)
+        
+        now = datetime.now()
+        for entry in entries:
+            try:
+                chat_id = entry["chat_id"]
+                bot = get_bot(entry.get("bot_id", 0))
+                key = StorageKey(bot_id=bot.id, chat_id=chat_id, user_id=chat_id)
+                state = FSMContext(storage=storage, key=key)
+                await state.set_data(entry["data"])
+                await state.set_state(entry["state"])
+                
+                deadline = entry["deadline"]
+                remaining = (datetime.fromisoformat(deadline) - now).total_seconds() if deadline else None
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                logger.error("Skipping invalid saved timer %r: %s", entry, e)
+                continue
+            if remaining is not None:
+                schedule_payment_timer(bot, chat_id, state, duration=max(0, int(remaining)))
+            restored += 1
+    
+    return restored
+
+
+async def run_timer_restore(
+    get_bot: Callable[[int], Bot],
+    storage: BaseStorage,
+    path: str,
+    interval: float = 30.0
+) -> None:
+    """
+    Restore saved timers now and whenever another instance saves some, until cancelled.
+
+    Run as a leader job: it starts each time this instance becomes
+    leader, so timers saved by the previous leader are picked up even
+    when leadership changes long after startup.
+    """
+    while True:
+        try:
+            restored = await restore_timers(get_bot, storage, path)
+            if restored:
+                logger.info("Restored %d payment timers", restored)
+        except Exception as e:
+            logger.error("Timer restore failed: %s", e, exc_info=True)
+        await asyncio.sleep(interval)
@@ -2,6 +2,7 @@
 Multi-language translations for YouTube Premium Bot
 Supports: English, Bengali (বাংলা), Hindi (हिन्दी)
 """
+from functools import lru_cache
 
 TRANSLATIONS = {
     "en": {
@@ -26,20 +27,10 @@ TRANSLATIONS = {
                           "अपनी पसंदीदा भाषा चुनें:\n"
                           "আপনার পছন্দের ভাষা নির্বাচন করুন:",
         "language_changed": "✅ Language changed to English!",
-        "choose_plan": "🎥 <b>Choose Your YouTube Premium Plan</b>\n\n"
-                      "🎯 <b>Includes YouTube Music Premium!</b>\n\n"
-                      "🔹 <b>1 Month</b> - ₹20\n"
-                      "   • Ad-free videos\n"
-                      "   • Background play\n"
-                      "   • Download videos\n"
-                      "   • YouTube Music included\n\n"
-                      "🔹 <b>3 Months</b> - ₹55 🔥\n"
-                      "   • <i>Save ₹5! Most Popular!</i>\n"
-                      "   • All features for 3 months\n"
-                      "   • Best value for money\n\n"
-                      "🔜 <b>6 Months</b> - ₹100 (Coming Soon)\n"
-                      "   • <i>Save ₹20! Available soon!</i>\n\n"
-                      "💡 Click a button below to proceed:",
+        "choose_plan_header": "🎥 <b>Choose Your YouTube Premium Plan</b>\n\n"
+                             "🎯 <b>Includes YouTube Music Premium!</b>",
+        "choose_plan_footer": "💡 Click a button below to proceed:",
+        "plan_coming_soon": "Coming Soon",
         "back_menu": "🔙 Back to Menu",
         "coming_soon": "🔜 Coming Soon",
         "upload_now": "📸 Upload Screenshot Now",
@@ -57,6 +48,25 @@ TRANSLATIONS = {
                           "⏱️ Ends at: {}\n\n"
                           "✅ <b>Upload screenshot anytime within 5 minutes!</b>\n"
                           "No need to wait - upload as soon as you complete payment.",
+        "payment_reference": "🔖 Reference: <code>{}</code>\n"
+                            "<i>Add it to the payment note if your UPI app asks.</i>",
+        "slow_down": "⏳ Slow down! Please wait a moment and try again.",
+        "renewal_reminder": "🔔 <b>Renewal reminder</b>\n\n"
+                           "Your <b>{}</b> plan ends on <b>{}</b>.\n"
+                           "Tap 🎥 YouTube Premium to renew without a break.",
+        "msg_status_header": "📊 <b>My Status</b>",
+        "status_active": "✅ Active until <b>{}</b>\n💎 Plan: {}",
+        "status_expired": "⌛ Your subscription ended on <b>{}</b>.",
+        "status_none": "❌ No active subscription.",
+        "waitlist_joined": "⏳ <b>High demand right now!</b>\n\n"
+                          "We are reviewing a lot of payments, so new orders are paused for a moment.\n\n"
+                          "🧍 You are <b>#{}</b> in line.\n"
+                          "🕒 Estimated wait: <b>{}</b>\n\n"
+                          "We will message you as soon as it is your turn.",
+        "waitlist_eta_minutes": "about {} min",
+        "waitlist_eta_unknown": "a few minutes",
+        "waitlist_resume": "🎉 <b>It's your turn!</b>\n\n"
+                          "Tap 🎥 YouTube Premium within {} minutes to continue your order.",
         "timer_started": "⏱️ <b>Timer Started!</b>\n\n"
                         "🎯 You can upload your payment screenshot <b>anytime</b> within the next 5 minutes.\n\n"
                         "📸 <b>Just send the photo directly</b> or click 'Upload Screenshot Now' button.\n\n"
@@ -127,20 +137,10 @@ TRANSLATIONS = {
                           "Please choose your preferred language:\n"
                           "अपनी पसंदीदा भाषा चुनें:",
         "language_changed": "✅ ভাষা বাংলায় পরিবর্তন করা হয়েছে!",
-        "choose_plan": "🎥 <b>আপনার YouTube Premium প্ল্যান বেছে নিন</b>\n\n"
-                      "🎯 <b>YouTube Music Premium অন্তর্ভুক্ত!</b>\n\n"
-                      "🔹 <b>১ মাস</b> - ₹20\n"
-                      "   • বিজ্ঞাপন-মুক্ত ভিডিও\n"
-                      "   • ব্যাকগ্রাউন্ড প্লে\n"
-                      "   • ভিডিও ডাউনলোড\n"
-                      "   • YouTube Music অন্তর্ভুক্ত\n\n"
-                      "🔹 <b>৩ মাস</b> - ₹55 🔥\n"
-                      "   • <i>₹5 সাশ্রয়! সবচেয়ে জনপ্রিয়!</i>\n"
-                      "   • ৩ মাসের জন্য সব ফিচার\n"
-                      "   • সবচেয়ে ভালো ভ্যালু\n\n"
-                      "🔜 <b>৬ মাস</b> - ₹100 (শীঘ্রই আসছে)\n"
-                      "   • <i>₹20 সাশ্রয়! শীঘ্রই উপলব্ধ!</i>\n\n"
-                      "💡 এগিয়ে যেতে নিচের বাটনে ক্লিক করুন:",
+        "choose_plan_header": "🎥 <b>আপনার YouTube Premium প্ল্যান বেছে নিন</b>\n\n"
+                             "🎯 <b>YouTube Music Premium অন্তর্ভুক্ত!</b>",
+        "choose_plan_footer": "💡 এগিয়ে যেতে নিচের বাটনে ক্লিক করুন:",
+        "plan_coming_soon": "শীঘ্রই আসছে",
         "back_menu": "🔙 মেনুতে ফিরুন",
         "coming_soon": "🔜 শীঘ্রই আসছে",
         "upload_now": "📸 এখনই স্ক্রিনশট আপলোড করুন",
@@ -158,6 +158,25 @@ TRANSLATIONS = {
                           "⏱️ শেষ হবে: {}\n\n"
                           "✅ <b>৫ মিনিটের মধ্যে যেকোনো সময় স্ক্রিনশট আপলোড করুন!</b>\n"
                           "অপেক্ষা করার প্রয়োজন নেই - পেমেন্ট সম্পন্ন করার সাথে সাথে আপলোড করুন।",
+        "payment_reference": "🔖 রেফারেন্স: <code>{}</code>\n"
+                            "<i>আপনার UPI অ্যাপ চাইলে পেমেন্ট নোটে এটি লিখুন।</i>",
+        "slow_down": "⏳ একটু ধীরে! কিছুক্ষণ অপেক্ষা করে আবার চেষ্টা করুন।",
+        "renewal_reminder": "🔔 <b>রিনিউ করার রিমাইন্ডার</b>\n\n"
+                           "আপনার <b>{}</b> প্ল্যান <b>{}</b> তারিখে শেষ হবে।\n"
+                           "বিরতি ছাড়া রিনিউ করতে 🎥 YouTube Premium চাপুন।",
+        "msg_status_header": "📊 <b>আমার স্ট্যাটাস</b>",
+        "status_active": "✅ <b>{}</b> পর্যন্ত সক্রিয়\n💎 প্ল্যান: {}",
+        "status_expired": "⌛ আপনার সাবস্ক্রিপশন <b>{}</b> তারিখে শেষ হয়েছে।",
+        "status_none": "❌ কোনো সক্রিয় সাবস্ক্রিপশন নেই।",
+        "waitlist_joined": "⏳ <b>এই মুহূর্তে অনেক চাহিদা!</b>\n\n"
+                          "আমরা অনেক পেমেন্ট যাচাই করছি, তাই নতুন অর্ডার কিছুক্ষণের জন্য বন্ধ আছে।\n\n"
+                          "🧍 লাইনে আপনার স্থান <b>#{}</b>।\n"
+                          "🕒 আনুমানিক অপেক্ষা: <b>{}</b>\n\n"
+                          "আপনার পালা এলেই আমরা আপনাকে মেসেজ করব।",
+        "waitlist_eta_minutes": "প্রায় {} মিনিট",
+        "waitlist_eta_unknown": "কয়েক মিনিট",
+        "waitlist_resume": "🎉 <b>এবার আপনার পালা!</b>\n\n"
+                          "অর্ডার চালিয়ে যেতে {} মিনিটের মধ্যে 🎥 YouTube Premium চাপুন।",
         "timer_started": "⏱️ <b>টাইমার শুরু হয়েছে!</b>\n\n"
                         "🎯 আপনি পরবর্তী ৫ মিনিটের মধ্যে <b>যেকোনো সময়</b> আপনার পেমেন্ট স্ক্রিনশট আপলোড করতে পারবেন।\n\n"
                         "📸 <b>সরাসরি ছবি পাঠান</b> অথবা 'Upload Screenshot Now' বাটনে ক্লিক করুন।\n\n"
@@ -228,20 +247,10 @@ TRANSLATIONS = {
                           "Please choose your preferred language:\n"
                           "अपनी पसंदीदा भाषा चुनें:",
         "language_changed": "✅ भाषा हिन्दी में बदल गई!",
-        "choose_plan": "🎥 <b>अपना YouTube Premium प्लान चुनें</b>\n\n"
-                      "🎯 <b>YouTube Music Premium शामिल!</b>\n\n"
-                      "🔹 <b>1 महीना</b> - ₹20\n"
-                      "   • विज्ञापन-মুক্ত वीडियो\n"
-                      "   • बैकग्राउंड प्ले\n"
-                      "   • वीडियो डाउनलोड\n"
-                      "   • YouTube Music शामिल\n\n"
-                      "🔹 <b>3 महीने</b> - ₹55 🔥\n"
-                      "   • <i>₹5 बचाएं! सबसे लोकप्रिय!</i>\n"
-                      "   • 3 महीने के लिए सभी सुविधाएं\n"
-                      "   • सबसे अच्छी वैल्यू\n\n"
-                      "🔜 <b>6 महीने</b> - ₹100 (जल्द आ रहा है)\n"
-                      "   • <i>₹20 बचाएं! जल्द उपलब्ध!</i>\n\n"
-                      "💡 आगे बढ़ने के लिए नीचे बटन पर क्लिक करें:",
+        "choose_plan_header": "🎥 <b>अपना YouTube Premium प्लान चुनें</b>\n\n"
+                             "🎯 <b>YouTube Music Premium शामिल!</b>",
+        "choose_plan_footer": "💡 आगे बढ़ने के लिए नीचे बटन पर क्लिक करें:",
+        "plan_coming_soon": "जल्द आ रहा है",
         "back_menu": "🔙 मेनू पर वापस",
         "coming_soon": "🔜 जल्द आ रहा है",
         "upload_now": "📸 अभी स्क्रीनशॉट अपलोड करें",
@@ -259,6 +268,25 @@ TRANSLATIONS = {
                           "⏱️ समाप्त होगा: {}\n\n"
                           "✅ <b>5 मिनट के भीतर कभी भी स्क्रीनशॉट अपलोड करें!</b>\n"
                           "प्रतीक्षा करने की आवश्यकता नहीं - भुगतान पूरा होते ही अपलोड करें।",
+        "payment_reference": "🔖 रेफरेंस: <code>{}</code>\n"
+                            "<i>अगर आपका UPI ऐप पूछे तो इसे पेमेंट नोट में लिखें।</i>",
+        "slow_down": "⏳ थोड़ा धीरे! कृपया कुछ देर रुककर फिर से कोशिश करें।",
+        "renewal_reminder": "🔔 <b>रिन्यूअल रिमाइंडर</b>\n\n"
+                           "आपका <b>{}</b> प्लान <b>{}</b> को समाप्त हो रहा है।\n"
+                           "बिना रुकावट रिन्यू करने के लिए 🎥 YouTube Premium दबाएँ।",
+        "msg_status_header": "📊 <b>मेरी स्थिति</b>",
+        "status_active": "✅ <b>{}</b> तक सक्रिय\n💎 प्लान: {}",
+        "status_expired": "⌛ आपकी सदस्यता <b>{}</b> को समाप्त हो गई।",
+        "status_none": "❌ कोई सक्रिय सदस्यता नहीं।",
+        "waitlist_joined": "⏳ <b>अभी बहुत ज़्यादा माँग है!</b>\n\n"
+                          "हम बहुत सारे पेमेंट की जाँच कर रहे हैं, इसलिए नए ऑर्डर थोड़ी देर के लिए रुके हैं।\n\n"
+                          "🧍 लाइन में आपका नंबर <b>#{}</b> है।\n"
+                          "🕒 अनुमानित इंतज़ार: <b>{}</b>\n\n"
+                          "आपकी बारी आते ही हम आपको मैसेज करेंगे।",
+        "waitlist_eta_minutes": "लगभग {} मिनट",
+        "waitlist_eta_unknown": "कुछ मिनट",
+        "waitlist_resume": "🎉 <b>आपकी बारी आ गई!</b>\n\n"
+                          "ऑर्डर जारी रखने के लिए {} मिनट के अंदर 🎥 YouTube Premium दबाएँ।",
         "timer_started": "⏱️ <b>टाइमर शुरू हो गया!</b>\n\n"
                         "🎯 आप अगले 5 मिनट के भीतर <b>कभी भी</b> अपना भुगतान स्क्रीनशॉट अपलोड कर सकते हैं।\n\n"
                         "📸 <b>सीधे फोटो भेजें</b> या 'Upload Screenshot Now' बटन पर क्लिक करें।\n\n"
@@ -327,8 +355,9 @@ def get_text(lang: str, key: str, *args) -> str:
     return text
 
 
+@lru_cache(maxsize=None)
 def get_language_keyboard():
-    """Get inline keyboard for language selection."""
+    """Get inline keyboard for language selection (built once)."""
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     
     keyboard = InlineKeyboardMarkup(